@@ -0,0 +1,101 @@
+"""Runs the filename and sprite checks of the bot on a local directory of sprites, without Discord:
+python -m bot.batch_analyzer <sprites dir> [--output results.jsonl] [--workers N]
+
+Every sprite gets a JSON line with its severity and issues, throughput is reported on stderr.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bot.core import sprite_analysis
+from bot.core.filename_analysis import get_fusion_filename
+from bot.core.issues import Issue, UnknownSprite, FileName, OutOfDex
+from bot.misc import utils
+from bot.misc.enums import Severity
+
+SEVERITY_ORDER = [Severity.accepted, Severity.ignored, Severity.controversial, Severity.refused]
+CHUNK_SIZE = 16         # Sprites sent to a worker at once
+PROGRESS_INTERVAL = 1000
+
+
+def analyze_file(path: str) -> dict:
+    filename = os.path.basename(path)
+    fusion_filename = get_fusion_filename(filename)
+    issues: list[Issue] = []
+    if fusion_filename.id_type.is_unknown():
+        issues.append(UnknownSprite())
+        issues.append(FileName(filename))
+    elif utils.is_invalid_fusion_id(fusion_filename.dex_ids):
+        issues.append(OutOfDex(fusion_filename.dex_ids))
+    try:
+        with open(path, 'rb') as f:
+            image_bytes = f.read()
+        result = sprite_analysis.analyze_sprite(image_bytes, fusion_filename.id_type)
+    except Exception as analysis_exception:
+        return {"file": path, "error": repr(analysis_exception)}
+    issues.extend(result.issues)
+    return {
+        "file": path,
+        "id_type": fusion_filename.id_type.value,
+        "dex_ids": fusion_filename.dex_ids,
+        "letter": fusion_filename.letter,
+        "severity": get_severity(issues).value,
+        "issues": [{"type": type(issue).__name__, "description": str(issue)} for issue in issues]
+    }
+
+
+def get_severity(issues: list[Issue]) -> Severity:
+    # Same outcome as adding the issues one by one to an Analysis
+    severity = Severity.accepted
+    for issue in issues:
+        if SEVERITY_ORDER.index(issue.severity) > SEVERITY_ORDER.index(severity):
+            severity = issue.severity
+    return severity
+
+
+def find_sprites(sprites_dir: str) -> list[str]:
+    sprite_paths = []
+    for directory, _subdirectories, filenames in os.walk(sprites_dir):
+        for filename in filenames:
+            if filename.lower().endswith(".png"):
+                sprite_paths.append(os.path.join(directory, filename))
+    sprite_paths.sort()
+    return sprite_paths
+
+
+def run(sprites_dir: str, output, workers: int|None) -> int:
+    sprite_paths = find_sprites(sprites_dir)
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for count, line in enumerate(executor.map(analyze_file, sprite_paths, chunksize=CHUNK_SIZE), start=1):
+            output.write(json.dumps(line) + "\n")
+            if count % PROGRESS_INTERVAL == 0:
+                print_throughput(count, start_time)
+    print_throughput(len(sprite_paths), start_time)
+    return len(sprite_paths)
+
+
+def print_throughput(count: int, start_time: float):
+    elapsed = time.perf_counter() - start_time
+    sprites_per_second = count / elapsed if elapsed > 0 else 0
+    print(f"{count} sprites in {elapsed:.1f}s ({sprites_per_second:.1f} sprites/sec)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze every sprite in a directory like Fusion Bot does")
+    parser.add_argument("sprites_dir")
+    parser.add_argument("--output", "-o", help="JSON Lines file, stdout by default")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="Worker processes, all cores by default")
+    args = parser.parse_args()
+    if args.output is None:
+        run(args.sprites_dir, sys.stdout, args.workers)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            run(args.sprites_dir, output, args.workers)
+
+
+if __name__ == "__main__":
+    main()
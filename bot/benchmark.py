@@ -0,0 +1,250 @@
+"""Times the sprite analysis hot paths on generated sprites, without Discord or network:
+python -m bot.benchmark [--repeat N] [--output results.json] [--save-baseline] [--tolerance 1.3]
+
+Every stage is timed on every fixture, and run once more under tracemalloc for its peak memory.
+When a baseline exists, stages that got slower than the tolerance are reported and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from typing import Callable
+
+import numpy
+from PIL.Image import fromarray
+from PIL.Image import open as image_open
+
+from bot.core import autogen, color_similarity, sprite_analysis
+from bot.core.analysis import Analysis
+from bot.core.analysis_input import AnalysisInput
+from bot.core.filename_analysis import get_fusion_filename
+from bot.misc.enums import AnalysisType
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(CURRENT_DIR, "..", "data", "BenchmarkBaseline.json")
+
+COLOR_COUNTS = [8, 32, 64, 256]
+SIZES = [288, 160, 1024]
+HALF_PIXEL_DENSITIES = [0, 0.001, 0.01, 0.05]     # Share of the pixels that break the grid
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 1.3
+
+FIXTURE_FILENAMES = {288: "1.2.png", 160: "1_egg.png", 1024: "1.2.png"}
+FIXTURE_STEPS = {288: sprite_analysis.STEP, 160: sprite_analysis.EGG_STEP, 1024: sprite_analysis.STEP}
+TRANSPARENT_SHARE = 0.3     # Share of the grid cells that are fully transparent background
+HALF_TRANSPARENT_SHARE = 0.1
+
+FILENAMES = ["1.2.png", "123.456b.png", "25.png", "1.2.3.png", "1_egg.png", "420.69ab_by_someone.png",
+             "sprite.png", "1.2 (1).png", "999.999.png", "image0.jpg"]
+FILENAME_BATCH = 1000
+
+AUTOGEN_HEAD_ID = "99999"   # Outside of the atlas, so it's always cut from the generated sheet
+AUTOGEN_BODY_COUNT = 480
+AUTOGEN_BATCH = 50
+
+
+class Fixture:
+    def __init__(self, size: int, color_count: int, density: float):
+        self.name = f"{size}px/{color_count}c/{density}hp"
+        self.size = size
+        self.color_count = color_count
+        self.filename = FIXTURE_FILENAMES[size]
+        self.image_bytes = generate_sprite(size, FIXTURE_STEPS[size], color_count, density)
+
+
+def generate_sprite(size: int, step: int, color_count: int, density: float) -> bytes:
+    """Sprite drawn on the pixel grid with exactly color_count visible colors, and some half pixels"""
+    rng = numpy.random.default_rng(size * 1000 + color_count + int(density * 10000))
+    palette = rng.integers(1, 256, size=(color_count, 4), dtype=numpy.uint8)
+    palette[:, 3] = 255
+    palette[:int(color_count * HALF_TRANSPARENT_SHARE), 3] = 128
+    cells = -(-size // step)
+    cell_colors = rng.integers(0, color_count, size=(cells, cells))
+    cell_colors.flat[:color_count] = numpy.arange(color_count)     # Every color is used at least once
+    pixel_array = palette[cell_colors]
+    background = rng.random((cells, cells)) < TRANSPARENT_SHARE
+    background.flat[:color_count] = False
+    pixel_array[background] = 0
+    pixel_array = pixel_array.repeat(step, 0).repeat(step, 1)[:size, :size].copy()
+    half_pixel_amount = int(size * size * density)
+    half_pixels_i = rng.integers(0, size, half_pixel_amount)
+    half_pixels_j = rng.integers(0, size, half_pixel_amount)
+    pixel_array[half_pixels_i, half_pixels_j] = palette[rng.integers(0, color_count, half_pixel_amount)]
+    bytes_buffer = BytesIO()
+    fromarray(pixel_array, "RGBA").save(bytes_buffer, format="PNG")
+    return bytes_buffer.getvalue()
+
+
+def generate_spritesheet() -> bytes:
+    rows = -(-AUTOGEN_BODY_COUNT // autogen.SHEET_COLUMNS)
+    rng = numpy.random.default_rng(AUTOGEN_BODY_COUNT)
+    palette = rng.integers(0, 256, size=(64, 4), dtype=numpy.uint8)
+    cell_colors = rng.integers(0, len(palette), size=(rows * 32, autogen.SHEET_COLUMNS * 32))
+    pixel_array = palette[cell_colors].repeat(3, 0).repeat(3, 1)
+    bytes_buffer = BytesIO()
+    fromarray(pixel_array, "RGBA").save(bytes_buffer, format="PNG")
+    return bytes_buffer.getvalue()
+
+
+def reset_caches():
+    """Every run starts cold, otherwise a slower delta computation would hide behind the cache"""
+    color_similarity.delta_cache.clear()
+    color_similarity.get_lab_values.cache_clear()
+
+
+def get_sprite_context(fixture: Fixture) -> sprite_analysis.SpriteContext:
+    fusion_filename = get_fusion_filename(fixture.filename)
+    context = sprite_analysis.SpriteContext(fixture.image_bytes, fusion_filename.id_type)
+    context.turn_image_into_rgb()
+    return context
+
+
+def get_useful_colors(fixture: Fixture) -> list[tuple[int, int, int]]:
+    context = get_sprite_context(fixture)
+    # Without the color limit, so that the over the limit fixtures still get a similarity stage
+    all_colors = context.image.getcolors(context.image.width * context.image.height)
+    return sprite_analysis.get_rgb_color_list(sprite_analysis.remove_useless_colors(all_colors))
+
+
+def run_sprite_analysis(fixture: Fixture):
+    analysis_input = AnalysisInput(fixture.filename, None, "", 0, "benchmark", "", 0,
+                                   AnalysisType.ping_reply, attachment_bytes=fixture.image_bytes)
+    sprite_analysis.main(Analysis(analysis_input))
+
+
+def get_stages(fixture: Fixture) -> dict[str, Callable[[], object]]:
+    stages: dict[str, Callable[[], object]] = {
+        "sprite_analysis.main": lambda: run_sprite_analysis(fixture)
+    }
+    rgb_color_list = get_useful_colors(fixture)
+    stages["get_similar_color_dict"] = lambda: sprite_analysis.get_similar_color_dict(rgb_color_list)
+    context = get_sprite_context(fixture)
+    if context.image.size == context.valid_size:
+        # Same as the bot, the overlays are only made for sprites of the right size
+        stages["highlight_half_pixels"] = lambda: context.highlight_half_pixels(strict_grid=True)
+        stages["highlight_transparency"] = context.highlight_transparency
+    return stages
+
+
+def get_shared_stages() -> dict[str, Callable[[], object]]:
+    spritesheet_bytes = generate_spritesheet()
+    with image_open(BytesIO(spritesheet_bytes)) as sheet_file:
+        spritesheet = sheet_file.copy()
+    autogen.sheet_cache.put(AUTOGEN_HEAD_ID, spritesheet)
+    body_ids = [str(body_id) for body_id in range(1, AUTOGEN_BATCH + 1)]
+    return {
+        f"get_fusion_filename/x{FILENAME_BATCH}":
+            lambda: [get_fusion_filename(filename) for _ in range(FILENAME_BATCH // len(FILENAMES))
+                     for filename in FILENAMES],
+        f"cut_from_spritesheet/x{AUTOGEN_BATCH}":
+            lambda: [autogen.cut_from_spritesheet(spritesheet, body_id) for body_id in body_ids],
+        f"generate_autogen_png/x{AUTOGEN_BATCH}":
+            lambda: [autogen.generate_autogen_png(AUTOGEN_HEAD_ID, body_id) for body_id in body_ids]
+    }
+
+
+def measure(stage: Callable[[], object], repeat: int) -> dict[str, float]:
+    """Best and median time in milliseconds, and peak traced memory in KiB"""
+    timings = []
+    for _ in range(repeat):
+        reset_caches()
+        start_time = time.perf_counter()
+        stage()
+        timings.append((time.perf_counter() - start_time) * 1000)
+    reset_caches()
+    tracemalloc.start()
+    try:
+        stage()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "peak_kib": round(peak_memory / 1024, 1)
+    }
+
+
+def run(repeat: int) -> dict[str, dict[str, float]]:
+    results = {}
+    for stage_name, stage in get_shared_stages().items():
+        results[stage_name] = measure(stage, repeat)
+        print_result(stage_name, results[stage_name])
+    for size in SIZES:
+        for color_count in COLOR_COUNTS:
+            for density in HALF_PIXEL_DENSITIES:
+                fixture = Fixture(size, color_count, density)
+                for stage_name, stage in get_stages(fixture).items():
+                    case_name = f"{stage_name}/{fixture.name}"
+                    results[case_name] = measure(stage, repeat)
+                    print_result(case_name, results[case_name])
+    return results
+
+
+def compare_to_baseline(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]],
+                        tolerance: float) -> list[str]:
+    regressions = []
+    for case_name, result in results.items():
+        baseline_result = baseline.get(case_name)
+        if baseline_result is None or baseline_result["min_ms"] <= 0:
+            continue
+        ratio = result["min_ms"] / baseline_result["min_ms"]
+        if ratio > tolerance:
+            regressions.append(f"{case_name}: {baseline_result['min_ms']}ms -> {result['min_ms']}ms (x{ratio:.2f})")
+    return regressions
+
+
+def print_result(case_name: str, result: dict[str, float]):
+    print(f"{case_name:<64} {result['min_ms']:>10.3f}ms {result['median_ms']:>10.3f}ms "
+          f"{result['peak_kib']:>10.1f}KiB", file=sys.stderr)
+
+
+def load_baseline(baseline_file: str) -> dict[str, dict[str, float]]|None:
+    try:
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_results(results_file: str, results: dict[str, dict[str, float]]):
+    with open(results_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the sprite analysis stages on generated sprites")
+    parser.add_argument("--repeat", "-r", type=int, default=DEFAULT_REPEAT, help="Timed runs of every stage")
+    parser.add_argument("--output", "-o", help="JSON file for the results")
+    parser.add_argument("--baseline", "-b", default=BASELINE_FILE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", "-t", type=float, default=DEFAULT_TOLERANCE,
+                        help="Slowdown ratio over the baseline that counts as a regression")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    if args.output:
+        write_results(args.output, results)
+    if args.save_baseline:
+        write_results(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}", file=sys.stderr)
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print("No baseline to compare against, save one with --save-baseline", file=sys.stderr)
+        return
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+    print("No regressions over the baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
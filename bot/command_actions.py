@@ -1,12 +1,16 @@
+from io import BytesIO
+
 import discord
-import requests
 from PIL import UnidentifiedImageError
 from PIL.Image import open as image_open
 from colormath.color_objects import sRGBColor
 from discord import Interaction, DMChannel
 from discord.embeds import Embed
 
-from bot.core import sprite_analysis
+from bot.core import sprite_analysis, autogen, sprite_cache
+from bot.misc import timings
+from bot.misc.exceptions import AttachmentTooLarge
+from bot.misc.fetcher import read_attachment
 from bot.spritework.tutorial_mode import PromptButtonsView
 from bot.misc.utils import fancy_print
 
@@ -24,8 +28,12 @@ NO_ATTACHMENT = "No suitable attachment was found."
 WRONG_ATTACHMENT = "Couldn't parse the attachment as an image."
 NO_SIM_PAIRS = "No similar pairs have been found."
 COLOR_COUNT_ERROR = "The image had too many colors."
+TOO_LARGE_ERROR = "The attachment is too large."
 CULLED_PAIRS_FOOTER = "This list does not include all pairs, as there were too many."
-TIMEOUT = 10
+TIMINGS_TITLE = "**Analysis stage timings (ms):**"
+TIMINGS_DISABLED = "Timings are disabled, use /timings enable:True to start recording them."
+NO_TIMINGS = "No stages have been recorded yet."
+CACHES_TITLE = "**Caches:**"
 ALL_COLOR_LIMIT = 256
 PAIR_LIST_LIMIT = 20
 
@@ -43,9 +51,14 @@ async def similar_action(interaction: discord.Interaction, attachment: discord.A
         await error_embed(interaction, NO_ATTACHMENT)
         return
 
-    raw_data = requests.get(attachment.url, stream = True, timeout = TIMEOUT).raw
     try:
-        image = image_open(raw_data).convert("RGBA")
+        image_bytes = await read_attachment(attachment)
+    except AttachmentTooLarge:
+        await error_embed(interaction, TOO_LARGE_ERROR)
+        return
+
+    try:
+        image = image_open(BytesIO(image_bytes)).convert("RGBA")
     except UnidentifiedImageError:
         await error_embed(interaction, WRONG_ATTACHMENT)
         return
@@ -78,6 +91,39 @@ async def similar_action(interaction: discord.Interaction, attachment: discord.A
 
 
 
+async def timings_action(interaction: discord.Interaction, enable: bool|None):
+    log_command(interaction, "/timings")
+    if enable is not None:
+        timings.set_enabled(enable)
+
+    if not timings.enabled:
+        description = TIMINGS_DISABLED
+    elif not timings.stage_durations:
+        description = NO_TIMINGS
+    else:
+        stage_stats = timings.format_stage_stats()
+        print(stage_stats)
+        description = f"```\n{stage_stats}\n```"
+
+    cache_stats = format_cache_stats(get_cache_stats())
+    print(cache_stats)
+    description = f"{description}\n{CACHES_TITLE}\n```\n{cache_stats}\n```"
+    await interaction.response.send_message(embed = Embed(title = TIMINGS_TITLE, description = description))
+
+
+def get_cache_stats() -> dict[str, dict[str, int]]:
+    cache_stats = {f"autogen {cache_name}": stats for cache_name, stats in autogen.get_cache_stats().items()}
+    cache_stats["sprite results"] = sprite_cache.get_result_cache_stats()
+    return cache_stats
+
+
+def format_cache_stats(cache_stats: dict[str, dict[str, int]]) -> str:
+    lines = [f"{'cache':<16}{'hits':>8}{'misses':>8}{'entries':>9}{'used':>7}"]
+    for cache_name, stats in cache_stats.items():
+        used_share = stats["size"] / stats["max_size"] if stats["max_size"] else 0
+        lines.append(f"{cache_name:<16}{stats['hits']:>8}{stats['misses']:>8}{stats['entries']:>9}{used_share:>7.0%}")
+    return "\n".join(lines)
+
 
 def get_sorted_color_dict(image) -> frozenset[frozenset[tuple]]:
     all_colors = image.getcolors(ALL_COLOR_LIMIT)
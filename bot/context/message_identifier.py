@@ -24,6 +24,10 @@ def is_assets_gallery(message: Message) -> bool:
     return message.channel.id == id_channel_assets_pif
 
 
+def is_gallery_channel(channel_id: int) -> bool:
+    return channel_id in [id_channel_gallery_pif, id_channel_assets_pif]
+
+
 def is_mentioning_reply(message: Message) -> bool:
     return is_mentioning_bot(message) and is_reply(message)
 
@@ -74,8 +78,7 @@ def has_ignored_spritework_tags(thread: Thread) -> bool:
     return False
 
 
-def is_intentional_transparency(message: Message) -> bool:
-    content = message.content
+def is_intentional_transparency(content: str) -> bool:
     if not content:
         return False
     result = re.search(r'(?i)\b(intentional|intended)\s+transparency\b', content)
@@ -0,0 +1,46 @@
+from bot.misc.enums import AnalysisType
+
+
+class AnalysisInput:
+    """Everything an analysis needs from a discord Message, one per analyzed sprite.
+    Plain data, so it can be pickled, cached or built without Discord at all."""
+    __slots__ = ("filename", "attachment_url", "attachment_bytes", "content", "author_id", "author_name",
+                 "author_avatar_url", "jump_url", "message_id", "analysis_type", "attachment_too_large")
+    filename: str|None              # None when there's no sprite to analyze
+    attachment_url: str|None
+    attachment_bytes: bytes|None    # Image that was already read, if any
+    content: str
+    author_id: int
+    author_name: str
+    author_avatar_url: str|None
+    jump_url: str
+    message_id: int
+    analysis_type: AnalysisType
+    attachment_too_large: bool      # Over the download cap, so it couldn't be read
+
+    def __init__(self,
+                 filename: str|None,
+                 attachment_url: str|None,
+                 content: str,
+                 author_id: int,
+                 author_name: str,
+                 jump_url: str,
+                 message_id: int,
+                 analysis_type: AnalysisType,
+                 author_avatar_url: str|None = None,
+                 attachment_bytes: bytes|None = None,
+                 attachment_too_large: bool = False):
+        self.filename = filename
+        self.attachment_url = attachment_url
+        self.attachment_bytes = attachment_bytes
+        self.content = content
+        self.author_id = author_id
+        self.author_name = author_name
+        self.author_avatar_url = author_avatar_url
+        self.jump_url = jump_url
+        self.message_id = message_id
+        self.analysis_type = analysis_type
+        self.attachment_too_large = attachment_too_large
+
+    def has_sprite(self) -> bool:
+        return self.filename is not None or self.attachment_url is not None
@@ -0,0 +1,31 @@
+from typing import NamedTuple
+
+from bot.misc.enums import Severity
+from .issues import IssueRecord, Issues, issue_from_record
+
+
+class AnalysisResult(NamedTuple):
+    """Immutable outcome of an analysis, with everything needed to render its embeds.
+    It's a plain tuple of builtins, enums and bytes, so it's cheap to pickle, cache and ship between processes."""
+    severity: Severity
+    issues: tuple[IssueRecord, ...]
+    ai_suspicion: int
+    fusion_id: str
+    id_and_letter: str|None
+    autogen_available: bool
+    size_issue: bool
+    transparency_issue: bool
+    half_pixels_issue: bool
+    transparency_png: bytes|None
+    half_pixels_png: bytes|None
+    attachment_url: str|None
+    jump_url: str
+    author_name: str
+    author_avatar_url: str|None
+    first_line: str|None
+
+    def get_issues(self) -> Issues:
+        issues = Issues()
+        for issue_record in self.issues:
+            issues.add(issue_from_record(issue_record))
+        return issues
@@ -1,54 +1,65 @@
-from discord.message import Message, Attachment
-from discord import User, TextChannel, Thread, DMChannel
+import asyncio
 
-from bot.spritework.opt_out_options import HideAutoAnalysis
-from bot.misc.enums import AnalysisType
-from . import content_analysis, sprite_analysis, gallery_analysis
-from .analysis import Analysis, generate_file_from_image, get_autogen_file
-from ..misc.utils import attachment_not_an_image
-
-
-def generate_analysis(
-        message: Message,
-        specific_attachment: Attachment|None = None,
-        analysis_type: AnalysisType|None = None) -> Analysis:
+from discord import User, Member, TextChannel, Thread, DMChannel
 
-    analysis = Analysis(message, specific_attachment, analysis_type)
-    content_analysis.main(analysis)
-    sprite_analysis.main(analysis)
-    analysis.generate_embed()
+from bot.misc.timings import Span
+from bot.spritework.opt_out_options import HideAutoAnalysis
+from . import content_analysis, sprite_executor, gallery_analysis
+from .analysis import Analysis, generate_file_from_bytes, load_autogen_file
+from .analysis_input import AnalysisInput
+from .embed_renderer import render_embed, render_transparency_embed, render_half_pixels_embed
+from .issues import FileTooLarge
+from ..misc.exceptions import AttachmentTooLarge
+from ..misc.fetcher import fetch_attachment, MAX_ATTACHMENT_SIZE
+
+
+async def generate_analysis(analysis_input: AnalysisInput) -> Analysis:
+    with Span("analysis.total"):
+        analysis = Analysis(analysis_input)
+        with Span("analysis.content"):
+            content_analysis.main(analysis)
+        with Span("analysis.download"):
+            await load_attachment(analysis)
+        if analysis.attachment_bytes is not None:
+            with Span("analysis.sprite"):
+                await sprite_executor.main(analysis)
+        analysis.generate_result()
     return analysis
 
 
-async def generate_gallery_analysis_list(
-        message: Message,
-        analysis_type: AnalysisType|None = None) -> list[Analysis]:
-
-    if message.attachments is None:
-        return no_attachment_analysis(message, analysis_type)
+async def generate_gallery_analysis_list(analysis_inputs: list[AnalysisInput]) -> list[Analysis]:
+    """One analysis per image of the same gallery message"""
+    with Span("gallery.total"):
+        analysis_list = [Analysis(analysis_input) for analysis_input in analysis_inputs]
 
-    analysis_list = []
-    for attachment in message.attachments:
-        if attachment_not_an_image(attachment):
-            continue
-        analysis = Analysis(message, attachment, analysis_type)
-        analysis_list.append(analysis)
+        with Span("gallery.checks"):
+            await gallery_analysis.main(analysis_list)
+        with Span("gallery.download"):
+            await asyncio.gather(*(load_attachment(analysis) for analysis in analysis_list))
 
-    await gallery_analysis.main(analysis_list)
+        with Span("gallery.sprite"):
+            await asyncio.gather(*(sprite_executor.main(analysis) for analysis in analysis_list
+                                   if analysis.attachment_bytes is not None))
 
-    for analysis in analysis_list:
-        sprite_analysis.main(analysis)
-        analysis.generate_embed()
+        for analysis in analysis_list:
+            analysis.generate_result()
 
     return analysis_list
 
 
-def no_attachment_analysis(
-        message: Message,
-        analysis_type: AnalysisType|None = None)  -> list[Analysis]:
-    analysis = Analysis(message, None, analysis_type)
-    content_analysis.handle_no_content(analysis)
-    return [analysis]
+async def load_attachment(analysis: Analysis):
+    """Message attachments are already read by the handler, this downloads Zigzag embed images
+    and anything else that only came with a URL"""
+    if analysis.attachment_bytes is not None:
+        return
+    if analysis.input.attachment_too_large:
+        analysis.add_issue(FileTooLarge(MAX_ATTACHMENT_SIZE))
+        return
+    if analysis.attachment_url is not None:
+        try:
+            analysis.attachment_bytes = await fetch_attachment(analysis.attachment_url)
+        except AttachmentTooLarge:
+            analysis.add_issue(FileTooLarge(MAX_ATTACHMENT_SIZE))
 
 
 # Methods to send messages in #fusion-bot
@@ -56,49 +67,57 @@ def no_attachment_analysis(
 async def send_full_analysis(analysis: Analysis,
                              channel: TextChannel|Thread|DMChannel,
                              author: User):
-    if analysis.severity.is_warn_severity() and analysis.type.is_gallery():
-        await send_analysis(analysis, channel, author)
-    else:
-        await send_analysis(analysis, channel)
-    await send_extra_embeds(analysis, channel)
+    with Span("send.analysis"):
+        if analysis.severity.is_warn_severity() and analysis.type.is_gallery():
+            await send_analysis(analysis, channel, author, owner=author)
+        else:
+            await send_analysis(analysis, channel, owner=author)
+    with Span("send.extra_embeds"):
+        await send_extra_embeds(analysis, channel)
 
 
 async def send_extra_embeds(analysis: Analysis,
                             channel: TextChannel|Thread|DMChannel):
-    if analysis.transparency_issue:
+    result = analysis.result
+    if result.transparency_issue:
         await channel.send(
-            embed=analysis.transparency_embed,
-            file=generate_file_from_image(analysis.transparency_image)
+            embed=render_transparency_embed(),
+            file=generate_file_from_bytes(result.transparency_png)
         )
-    if analysis.half_pixels_issue:
+    if result.half_pixels_issue:
         await channel.send(
-            embed=analysis.half_pixels_embed,
-            file=generate_file_from_image(analysis.half_pixels_image)
+            embed=render_half_pixels_embed(),
+            file=generate_file_from_bytes(result.half_pixels_png)
         )
 
 
 async def send_analysis(analysis: Analysis,
                         channel: TextChannel|Thread|DMChannel,
-                        author: User|None = None):
+                        author: User|None = None,
+                        owner: User|Member|None = None):
+    """author gets pinged, owner is the one who can hide an automatic analysis"""
     if author:
         ping_owner = author.mention
     else:
         ping_owner = None
 
-    if analysis.type.is_automatic_spritework_analysis():
-        buttons_view = HideAutoAnalysis(analysis.message.author)
+    if analysis.type.is_automatic_spritework_analysis() and owner is not None:
+        buttons_view = HideAutoAnalysis(owner)
     else:
         buttons_view = None
 
-    if analysis.autogen_available:
-        autogen_file = get_autogen_file(analysis.fusion_id)
+    result = analysis.result
+    if result.autogen_available:
+        with Span("send.autogen"):
+            autogen_file = await load_autogen_file(result.fusion_id)
     else:
         autogen_file = None
 
+    embed = render_embed(result)
     if autogen_file:
-        sent_message = await channel.send(embed=analysis.embed, content=ping_owner, file=autogen_file, view=buttons_view)
+        sent_message = await channel.send(embed=embed, content=ping_owner, file=autogen_file, view=buttons_view)
     else:
-        sent_message = await channel.send(embed=analysis.embed, content=ping_owner, view=buttons_view)
+        sent_message = await channel.send(embed=embed, content=ping_owner, view=buttons_view)
 
     if buttons_view:
         buttons_view.message = sent_message
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import threading
+from io import BytesIO
+
+from PIL.Image import Image, open as image_open
+from PIL.ImageOps import scale as image_scale
+
+from bot.misc.cache import LRUCache, DiskCache
+from .autogen_atlas import AutogenAtlas, ATLAS_FILE
+
+AUTOGEN_SIZE = 96
+AUTOGEN_SCALE = 3
+SHEET_COLUMNS = 10
+
+# Popular heads get requested many times a day, so both their decoded spritesheet
+# and the final upscaled PNGs of the fusions already sent are kept in memory
+SHEET_CACHE_SIZE = 128 * 1024 * 1024    # In bytes of decoded pixels, a full head sheet is around 20MB
+PNG_CACHE_SIZE = 16 * 1024 * 1024       # In bytes of encoded PNGs
+# The PNGs are also kept on disk between restarts, named after their fusion id
+DISK_CACHE_SIZE = 256 * 1024 * 1024     # In bytes of encoded PNGs
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+SPRITESHEETS_DIR = os.path.join(CURRENT_DIR, "..", "..", "data", "spritesheets_autogen")
+DISK_CACHE_DIR = os.path.join(CURRENT_DIR, "..", "..", "data", "autogen_cache")
+
+
+def get_sheet_size(spritesheet: Image) -> int:
+    return spritesheet.width * spritesheet.height * len(spritesheet.getbands())
+
+
+sheet_cache = LRUCache(SHEET_CACHE_SIZE, weigh=get_sheet_size)
+png_cache = LRUCache(PNG_CACHE_SIZE, weigh=len)
+disk_cache = DiskCache(DISK_CACHE_DIR, DISK_CACHE_SIZE)
+
+atlas: AutogenAtlas|None = None
+atlas_loaded = False
+# Generating can happen in worker threads, the sheet cache and atlas loading aren't thread safe
+generation_lock = threading.Lock()
+
+
+async def load_autogen_png(head_id: str, body_id: str) -> bytes:
+    """From the caches when possible, otherwise decoding, scaling and encoding are done outside the event loop"""
+    png_bytes = get_cached_png(head_id, body_id)
+    if png_bytes is None:
+        png_bytes = await asyncio.to_thread(generate_autogen_png, head_id, body_id)
+        store_png(head_id, body_id, png_bytes)
+    return png_bytes
+
+
+def get_cached_png(head_id: str, body_id: str) -> bytes|None:
+    png_bytes = png_cache.get((head_id, body_id))
+    if png_bytes is not None:
+        return png_bytes
+    png_bytes = disk_cache.get(get_disk_key(head_id, body_id))
+    if png_bytes is not None:
+        png_cache.put((head_id, body_id), png_bytes)
+    return png_bytes
+
+
+def store_png(head_id: str, body_id: str, png_bytes: bytes):
+    png_cache.put((head_id, body_id), png_bytes)
+    try:
+        disk_cache.put(get_disk_key(head_id, body_id), png_bytes)
+    except OSError as disk_error:
+        print(f"Couldn't store autogen {head_id}.{body_id} on disk: {disk_error}")
+
+
+def get_disk_key(head_id: str, body_id: str) -> str:
+    return f"{head_id}.{body_id}.png"
+
+
+def generate_autogen_png(head_id: str, body_id: str) -> bytes:
+    with generation_lock:
+        autogen = get_autogen_tile(head_id, body_id)
+    scaled_autogen = image_scale(autogen, AUTOGEN_SCALE, 0)
+    bytes_buffer = BytesIO()
+    scaled_autogen.save(bytes_buffer, format="PNG")
+    return bytes_buffer.getvalue()
+
+
+def get_autogen_tile(head_id: str, body_id: str) -> Image:
+    """From the prebuilt atlas when there's one, otherwise from the head spritesheet"""
+    autogen_atlas = get_atlas()
+    if autogen_atlas is not None:
+        tile = autogen_atlas.get_tile(int(head_id), int(body_id))
+        if tile is not None:
+            return tile
+    return cut_from_spritesheet(get_spritesheet(head_id), body_id)
+
+
+def get_atlas() -> AutogenAtlas|None:
+    global atlas, atlas_loaded
+    if not atlas_loaded:
+        atlas_loaded = True
+        if os.path.exists(ATLAS_FILE):
+            atlas = AutogenAtlas(ATLAS_FILE)
+    return atlas
+
+
+def get_spritesheet(head_id: str) -> Image:
+    spritesheet = sheet_cache.get(head_id)
+    if spritesheet is None:
+        head_sheet_dir = os.path.join(SPRITESHEETS_DIR, head_id + ".png")
+        with image_open(head_sheet_dir) as sheet_file:
+            spritesheet = sheet_file.copy()     # Decodes the whole sheet once and closes the file
+        sheet_cache.put(head_id, spritesheet)
+    return spritesheet
+
+
+def cut_from_spritesheet(spritesheet: Image, body_id: str) -> Image:
+    # ------------------- SPRITESHEET FORMAT -------------------
+    # There images have 10 columns. Elements are in 96x96 each.
+    # The first item is empty in all cases.
+    # It follows a left to right, top to bottom order.
+
+    # These are zero-indexed
+    sheet_order = int(body_id)
+    row_number    = sheet_order // SHEET_COLUMNS
+    column_number = sheet_order %  SHEET_COLUMNS
+    top_left_pos_x = column_number * AUTOGEN_SIZE
+    top_left_pos_y = row_number    * AUTOGEN_SIZE
+    bottom_right_pos_x = top_left_pos_x + AUTOGEN_SIZE
+    bottom_right_pos_y = top_left_pos_y + AUTOGEN_SIZE
+
+    return spritesheet.crop((top_left_pos_x, top_left_pos_y, bottom_right_pos_x, bottom_right_pos_y))
+
+
+def get_cache_stats() -> dict[str, dict[str, int]]:
+    return {
+        "sheets": sheet_cache.stats(),
+        "pngs": png_cache.stats(),
+        "disk": disk_cache.stats()
+    }
@@ -0,0 +1,139 @@
+"""Single file atlas of every autogen tile, built offline from data/spritesheets_autogen with:
+python -m bot.core.autogen_atlas
+
+File layout, all integers little endian:
+- Header: ATLAS_MAGIC, head count (u4), body count (u4)
+- Offset table: head count * body count entries of TILE_ENTRY, in (head, body) order
+- Tiles: colors * 4 bytes of RGBA palette followed by 96*96 palette indices,
+  or 96*96*4 bytes of RGBA pixels for tiles with more than 256 colors (colors = 0)
+
+Offset 0 means that the sheet of that head doesn't have that body. Identical tiles are stored once.
+"""
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+
+import numpy
+from PIL.Image import Image, open as image_open, fromarray
+
+from bot.misc.utils import open_atomically
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+SPRITESHEETS_DIR = os.path.join(CURRENT_DIR, "..", "..", "data", "spritesheets_autogen")
+ATLAS_FILE = os.path.join(CURRENT_DIR, "..", "..", "data", "AutogenAtlas.bin")
+
+AUTOGEN_SIZE = 96
+SHEET_COLUMNS = 10
+MAX_PALETTE_COLORS = 256
+
+ATLAS_MAGIC = b"PIFATLS1"
+HEADER_FORMAT = "<8sII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+TILE_ENTRY = numpy.dtype([("offset", "<u8"), ("colors", "<u2")])
+TILE_PIXELS = AUTOGEN_SIZE * AUTOGEN_SIZE
+SHEET_NAME_PATTERN = r'([1-9]\d*)\.png'
+
+
+class AutogenAtlas:
+    """Memory mapped atlas, tiles are sliced straight from the file without any decompression"""
+    head_count: int
+    body_count: int
+
+    def __init__(self, atlas_file: str = ATLAS_FILE):
+        with open(atlas_file, 'rb') as f:
+            self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.head_count, self.body_count = struct.unpack_from(HEADER_FORMAT, self.mapping)
+        if magic != ATLAS_MAGIC:
+            raise ValueError(f"{atlas_file} isn't an autogen atlas")
+        self.table = numpy.frombuffer(self.mapping, TILE_ENTRY, self.head_count * self.body_count, HEADER_SIZE)
+
+    def get_tile(self, head_id: int, body_id: int) -> Image|None:
+        if not (0 <= head_id < self.head_count and 0 <= body_id < self.body_count):
+            return None
+        entry = self.table[head_id * self.body_count + body_id]
+        offset = int(entry["offset"])
+        colors = int(entry["colors"])
+        if offset == 0:
+            return None
+        if colors == 0:
+            pixels = numpy.frombuffer(self.mapping, numpy.uint8, TILE_PIXELS * 4, offset)
+            return fromarray(pixels.reshape(AUTOGEN_SIZE, AUTOGEN_SIZE, 4), "RGBA")
+        palette = numpy.frombuffer(self.mapping, numpy.uint8, colors * 4, offset)
+        indices = numpy.frombuffer(self.mapping, numpy.uint8, TILE_PIXELS, offset + colors * 4)
+        tile = fromarray(indices.reshape(AUTOGEN_SIZE, AUTOGEN_SIZE), "P")
+        tile.putpalette(palette.tobytes(), "RGBA")
+        return tile
+
+    def close(self):
+        self.table = None
+        self.mapping.close()
+
+
+def build_atlas(sheets_dir: str = SPRITESHEETS_DIR, atlas_file: str = ATLAS_FILE) -> int:
+    """Returns the amount of distinct tiles written"""
+    sheet_files = get_sheet_files(sheets_dir)
+    if not sheet_files:
+        raise FileNotFoundError(f"No spritesheets found in {sheets_dir}")
+    head_count = max(sheet_files) + 1
+    body_count = max(get_sheet_cell_count(sheet_file) for sheet_file in sheet_files.values())
+    table = numpy.zeros(head_count * body_count, TILE_ENTRY)
+    tile_offsets: dict[bytes, tuple[int, int]] = {}
+
+    with open_atomically(atlas_file) as f:
+        f.write(struct.pack(HEADER_FORMAT, ATLAS_MAGIC, head_count, body_count))
+        f.write(table.tobytes())    # Placeholder, rewritten once every offset is known
+        for head_id, sheet_file in sorted(sheet_files.items()):
+            for body_id, tile_bytes, colors in get_encoded_tiles(sheet_file):
+                digest = hashlib.sha256(tile_bytes).digest()
+                if digest not in tile_offsets:
+                    tile_offsets[digest] = (f.tell(), colors)
+                    f.write(tile_bytes)
+                table[head_id * body_count + body_id] = tile_offsets[digest]
+        f.seek(HEADER_SIZE)
+        f.write(table.tobytes())
+    return len(tile_offsets)
+
+
+def get_sheet_files(sheets_dir: str) -> dict[int, str]:
+    sheet_files = {}
+    for filename in os.listdir(sheets_dir):
+        result = re.fullmatch(SHEET_NAME_PATTERN, filename)
+        if result is not None:
+            sheet_files[int(result.group(1))] = os.path.join(sheets_dir, filename)
+    return sheet_files
+
+
+def get_sheet_cell_count(sheet_file: str) -> int:
+    with image_open(sheet_file) as spritesheet:
+        return (spritesheet.height // AUTOGEN_SIZE) * SHEET_COLUMNS
+
+
+def get_encoded_tiles(sheet_file: str):
+    """(body id, tile bytes, palette colors) of every cell in the sheet"""
+    with image_open(sheet_file) as spritesheet:
+        sheet_array = numpy.asarray(spritesheet.convert("RGBA"))
+    row_count = sheet_array.shape[0] // AUTOGEN_SIZE
+    for body_id in range(row_count * SHEET_COLUMNS):
+        row_number    = body_id // SHEET_COLUMNS
+        column_number = body_id %  SHEET_COLUMNS
+        tile = sheet_array[row_number * AUTOGEN_SIZE:(row_number + 1) * AUTOGEN_SIZE,
+                           column_number * AUTOGEN_SIZE:(column_number + 1) * AUTOGEN_SIZE]
+        yield (body_id, *encode_tile(numpy.ascontiguousarray(tile)))
+
+
+def encode_tile(tile: numpy.ndarray) -> tuple[bytes, int]:
+    packed_pixels = tile.reshape(-1, 4).view(numpy.uint32).ravel()
+    palette, indices = numpy.unique(packed_pixels, return_inverse=True)
+    if len(palette) > MAX_PALETTE_COLORS:
+        return tile.tobytes(), 0
+    return palette.view(numpy.uint8).tobytes() + indices.astype(numpy.uint8).tobytes(), len(palette)
+
+
+if __name__ == "__main__":
+    source_dir = sys.argv[1] if len(sys.argv) > 1 else SPRITESHEETS_DIR
+    target_file = sys.argv[2] if len(sys.argv) > 2 else ATLAS_FILE
+    tile_amount = build_atlas(source_dir, target_file)
+    print(f"Wrote {tile_amount} distinct tiles to {target_file}")
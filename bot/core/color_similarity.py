@@ -0,0 +1,242 @@
+import json
+import os
+from functools import lru_cache
+
+import numpy
+from colormath.color_conversions import convert_color
+from colormath.color_objects import sRGBColor, LabColor
+
+from bot.misc.cache import LRUCache
+from bot.misc.utils import write_json_atomically
+
+# Vectorized versions of colormath's delta formulas. Colors are converted to Lab once and
+# compared as whole arrays of pairs, instead of building color objects for every single pair.
+
+LAB_TABLE_SIZE = 16384
+
+# Deltas of ordered RGB pairs, shared by every sprite analysis and /similar command
+DELTA_CACHE_SIZE = 65536
+PERSIST_DELTA_CACHE = False
+DELTA_CACHE_SAVE_INTERVAL = 2048    # New entries between saves to disk
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DELTA_CACHE_FILE = os.path.join(CURRENT_DIR, "..", "..", "data", "ColorDeltaCache.json")
+
+delta_cache = LRUCache(DELTA_CACHE_SIZE)
+delta_cache_loaded = False
+unsaved_delta_entries = 0
+
+
+@lru_cache(maxsize=LAB_TABLE_SIZE)
+def get_lab_values(rgb_color: tuple[int, int, int]) -> tuple[float, float, float]:
+    color_rgb = sRGBColor(rgb_color[0], rgb_color[1], rgb_color[2], True)
+    color_lab = convert_color(color_rgb, LabColor)
+    return color_lab.lab_l, color_lab.lab_a, color_lab.lab_b
+
+
+def get_lab_table(rgb_color_list: list[tuple[int, int, int]]) -> numpy.ndarray:
+    """Returns an (n, 3) array with the Lab values of each color, in the same order"""
+    lab_values = [get_lab_values(tuple(rgb_color)) for rgb_color in rgb_color_list]
+    return numpy.array(lab_values, dtype=numpy.float64).reshape(-1, 3)
+
+
+def get_rgb_array(rgb_color_list: list[tuple[int, int, int]]) -> numpy.ndarray:
+    return numpy.array(rgb_color_list, dtype=numpy.int64).reshape(-1, 3)
+
+
+# noinspection PyPep8Naming
+def delta_e_cie2000(lab_a: numpy.ndarray, lab_b: numpy.ndarray, Kl=1, Kc=1, Kh=1) -> numpy.ndarray:
+    """Delta E (CIE2000) between each row of lab_a and the same row of lab_b"""
+    L1, a1, b1 = lab_a[:, 0], lab_a[:, 1], lab_a[:, 2]
+    L2, a2, b2 = lab_b[:, 0], lab_b[:, 1], lab_b[:, 2]
+
+    avg_Lp = (L1 + L2) / 2.0
+
+    C1 = numpy.sqrt(numpy.power(a1, 2) + numpy.power(b1, 2))
+    C2 = numpy.sqrt(numpy.power(a2, 2) + numpy.power(b2, 2))
+
+    avg_C1_C2 = (C1 + C2) / 2.0
+
+    G = 0.5 * (1 - numpy.sqrt(numpy.power(avg_C1_C2, 7.0) / (numpy.power(avg_C1_C2, 7.0) + numpy.power(25.0, 7.0))))
+
+    a1p = (1.0 + G) * a1
+    a2p = (1.0 + G) * a2
+
+    C1p = numpy.sqrt(numpy.power(a1p, 2) + numpy.power(b1, 2))
+    C2p = numpy.sqrt(numpy.power(a2p, 2) + numpy.power(b2, 2))
+
+    avg_C1p_C2p = (C1p + C2p) / 2.0
+
+    h1p = numpy.degrees(numpy.arctan2(b1, a1p))
+    h1p += (h1p < 0) * 360
+
+    h2p = numpy.degrees(numpy.arctan2(b2, a2p))
+    h2p += (h2p < 0) * 360
+
+    avg_Hp = (((numpy.fabs(h1p - h2p) > 180) * 360) + h1p + h2p) / 2.0
+
+    T = 1 - 0.17 * numpy.cos(numpy.radians(avg_Hp - 30)) + \
+        0.24 * numpy.cos(numpy.radians(2 * avg_Hp)) + \
+        0.32 * numpy.cos(numpy.radians(3 * avg_Hp + 6)) - \
+        0.2 * numpy.cos(numpy.radians(4 * avg_Hp - 63))
+
+    diff_h2p_h1p = h2p - h1p
+    delta_hp = diff_h2p_h1p + (numpy.fabs(diff_h2p_h1p) > 180) * 360
+    delta_hp -= (h2p > h1p) * 720
+
+    delta_Lp = L2 - L1
+    delta_Cp = C2p - C1p
+    delta_Hp = 2 * numpy.sqrt(C2p * C1p) * numpy.sin(numpy.radians(delta_hp) / 2.0)
+
+    S_L = 1 + ((0.015 * numpy.power(avg_Lp - 50, 2)) / numpy.sqrt(20 + numpy.power(avg_Lp - 50, 2.0)))
+    S_C = 1 + 0.045 * avg_C1p_C2p
+    S_H = 1 + 0.015 * avg_C1p_C2p * T
+
+    delta_ro = 30 * numpy.exp(-(numpy.power(((avg_Hp - 275) / 25), 2.0)))
+    R_C = numpy.sqrt((numpy.power(avg_C1p_C2p, 7.0)) / (numpy.power(avg_C1p_C2p, 7.0) + numpy.power(25.0, 7.0)))
+    R_T = -2 * R_C * numpy.sin(2 * numpy.radians(delta_ro))
+
+    return numpy.sqrt(
+        numpy.power(delta_Lp / (S_L * Kl), 2) +
+        numpy.power(delta_Cp / (S_C * Kc), 2) +
+        numpy.power(delta_Hp / (S_H * Kh), 2) +
+        R_T * (delta_Cp / (S_C * Kc)) * (delta_Hp / (S_H * Kh)))
+
+
+# noinspection PyPep8Naming
+def delta_e_cmc(lab_a: numpy.ndarray, lab_b: numpy.ndarray, pl=2, pc=1) -> numpy.ndarray:
+    """Delta E (CMC) between each row of lab_a and the same row of lab_b. Not symmetric: lab_a is the reference"""
+    L, a, b = lab_a[:, 0], lab_a[:, 1], lab_a[:, 2]
+
+    C_1 = numpy.sqrt(numpy.power(a, 2) + numpy.power(b, 2))
+    C_2 = numpy.sqrt(numpy.power(lab_b[:, 1], 2) + numpy.power(lab_b[:, 2], 2))
+
+    delta_L = L - lab_b[:, 0]
+    delta_C = C_1 - C_2
+    delta_a = a - lab_b[:, 1]
+    delta_b = b - lab_b[:, 2]
+
+    H_1 = numpy.degrees(numpy.arctan2(b, a))
+    H_1 = numpy.where(H_1 < 0, H_1 + 360, H_1)
+
+    F = numpy.sqrt(numpy.power(C_1, 4) / (numpy.power(C_1, 4) + 1900.0))
+
+    T = numpy.where((164 <= H_1) & (H_1 <= 345),
+                    0.56 + numpy.abs(0.2 * numpy.cos(numpy.radians(H_1 + 168))),
+                    0.36 + numpy.abs(0.4 * numpy.cos(numpy.radians(H_1 + 35))))
+
+    S_L = numpy.where(L < 16, 0.511, (0.040975 * L) / (1 + 0.01765 * L))
+    S_C = ((0.0638 * C_1) / (1 + 0.0131 * C_1)) + 0.638
+    S_H = S_C * (F * T + 1 - F)
+
+    delta_H_sq = -numpy.power(delta_C, 2) + numpy.power(delta_a, 2) + numpy.power(delta_b, 2)
+    delta_H = numpy.sqrt(delta_H_sq.clip(min=0))
+
+    return numpy.sqrt(
+        numpy.power(delta_L / (pl * S_L), 2) +
+        numpy.power(delta_C / (pc * S_C), 2) +
+        numpy.power(delta_H / S_H, 2))
+
+
+def get_max_difference(rgb_a: numpy.ndarray, rgb_b: numpy.ndarray) -> numpy.ndarray:
+    return numpy.abs(rgb_a - rgb_b).max(axis=1)
+
+
+def get_near_pairs(rgb_array: numpy.ndarray, difference_limit: int) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Every (a, b) index pair with a != b whose channels all differ by at most difference_limit,
+    in the same order as two nested loops"""
+    # Sweep over the colors sorted by red: each color only pairs with the next ones
+    # whose red channel is still within the limit, instead of with the whole palette
+    sorted_order = numpy.argsort(rgb_array[:, 0], kind="stable")
+    sorted_red = rgb_array[sorted_order, 0]
+    window_ends = numpy.searchsorted(sorted_red, sorted_red + difference_limit, side="right")
+    window_sizes = window_ends - numpy.arange(len(sorted_red)) - 1
+
+    first_sorted = numpy.repeat(numpy.arange(len(sorted_red)), window_sizes)
+    window_starts = numpy.repeat(numpy.cumsum(window_sizes) - window_sizes, window_sizes)
+    second_sorted = first_sorted + 1 + (numpy.arange(len(first_sorted)) - window_starts)
+    first_index = sorted_order[first_sorted]
+    second_index = sorted_order[second_sorted]
+
+    near = get_max_difference(rgb_array[first_index], rgb_array[second_index]) <= difference_limit
+    first_index = first_index[near]
+    second_index = second_index[near]
+
+    # Both directions of each pair, back in nested loop order
+    index_a = numpy.concatenate((first_index, second_index))
+    index_b = numpy.concatenate((second_index, first_index))
+    loop_order = numpy.lexsort((index_b, index_a))
+    return index_a[loop_order], index_b[loop_order]
+
+
+def get_color_deltas(rgb_array: numpy.ndarray, lab_table: numpy.ndarray,
+                     index_a: numpy.ndarray, index_b: numpy.ndarray) -> numpy.ndarray:
+    """# ValueError
+    Returns an (m, 3) array of [cie2000, cmc, max_difference] for each (a, b) index pair"""
+    lab_a = lab_table[index_a]
+    lab_b = lab_table[index_b]
+    cie2000 = delta_e_cie2000(lab_a, lab_b)
+    cmc = delta_e_cmc(lab_a, lab_b)
+    if numpy.isnan(cie2000).any() or numpy.isnan(cmc).any():
+        raise ValueError("Undefined color delta")
+    max_difference = get_max_difference(rgb_array[index_a], rgb_array[index_b])
+    return numpy.stack((cie2000.astype(numpy.int64), cmc.astype(numpy.int64), max_difference), axis=1)
+
+
+def get_cached_color_deltas(rgb_color_list: list[tuple[int, int, int]],
+                            index_a: numpy.ndarray, index_b: numpy.ndarray) -> numpy.ndarray:
+    """# ValueError
+    Same as get_color_deltas, but only computes the pairs that aren't in the delta cache yet"""
+    load_delta_cache()
+    pair_keys = [(rgb_color_list[a], rgb_color_list[b]) for a, b in zip(index_a.tolist(), index_b.tolist())]
+    color_deltas = numpy.empty((len(pair_keys), 3), dtype=numpy.int64)
+    missing_pairs = []
+    for pair_index, pair_key in enumerate(pair_keys):
+        cached_delta = delta_cache.get(pair_key)
+        if cached_delta is None:
+            missing_pairs.append(pair_index)
+        else:
+            color_deltas[pair_index] = cached_delta
+
+    if not missing_pairs:
+        return color_deltas
+
+    missing_pairs = numpy.array(missing_pairs)
+    rgb_array = get_rgb_array(rgb_color_list)
+    lab_table = get_lab_table(rgb_color_list)
+    new_deltas = get_color_deltas(rgb_array, lab_table, index_a[missing_pairs], index_b[missing_pairs])
+    color_deltas[missing_pairs] = new_deltas
+    for pair_index, color_delta in zip(missing_pairs.tolist(), new_deltas.tolist()):
+        delta_cache.put(pair_keys[pair_index], tuple(color_delta))
+    handle_delta_cache_saving(len(missing_pairs))
+    return color_deltas
+
+
+def load_delta_cache():
+    global delta_cache_loaded
+    if delta_cache_loaded or not PERSIST_DELTA_CACHE:
+        return
+    delta_cache_loaded = True
+    try:
+        with open(DELTA_CACHE_FILE, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return  # Starts with a cold cache
+    for rgb_a, rgb_b, color_delta in entries:
+        delta_cache.put((tuple(rgb_a), tuple(rgb_b)), tuple(color_delta))
+
+
+def handle_delta_cache_saving(new_entries: int):
+    global unsaved_delta_entries
+    if not PERSIST_DELTA_CACHE:
+        return
+    unsaved_delta_entries += new_entries
+    if unsaved_delta_entries >= DELTA_CACHE_SAVE_INTERVAL:
+        save_delta_cache()
+
+
+def save_delta_cache():
+    global unsaved_delta_entries
+    entries = [[rgb_a, rgb_b, color_delta] for (rgb_a, rgb_b), color_delta in delta_cache.items()]
+    write_json_atomically(DELTA_CACHE_FILE, entries)
+    unsaved_delta_entries = 0
@@ -1,11 +1,10 @@
 import bot.misc.utils as utils
+from bot.misc.dex import get_dex
 from bot.misc.enums import IdType
 from .analysis import Analysis
 from .issues import (CustomBase, DifferentSprite, EggSprite, UnknownSprite, MissingFilename,
                      MissingSprite, OutOfDex, FileName, PokemonNames, TripleFusionSprite)
 
-NAME_MAP = utils.id_to_name_map()
-
 class ContentContext:
     id_type: IdType
     def __init__(self, analysis: Analysis):
@@ -15,7 +14,7 @@ class ContentContext:
         self.is_custom_base = self.id_type.is_custom_base()
         self.is_egg_sprite = self.id_type.is_egg()
 
-        self.content_fusion_ids_list = utils.extract_fusion_ids_from_content(analysis.message, self.id_type)
+        self.content_fusion_ids_list = utils.extract_fusion_ids_from_content(analysis.input.content, self.id_type)
 
         if self.content_fusion_ids_list:
             self.content_fusion_id = self.content_fusion_ids_list[0]
@@ -48,9 +47,7 @@ class ContentContext:
 
 
 def main(analysis: Analysis):
-    if (analysis.specific_attachment is not None)\
-            or analysis.has_attachment()\
-            or analysis.has_zigzag_embed():
+    if analysis.has_sprite():
         handle_some_content(analysis)
         return
 
@@ -99,13 +96,13 @@ def handle_dex_verification(analysis: Analysis, fusion_id: str):
 
 def handle_pokemon_names(analysis: Analysis, fusion_id: str):
     head, body = fusion_id.split(".")
-    head_name = NAME_MAP.get(head)
-    body_name = NAME_MAP.get(body)
+    head_name = get_dex().get_display_name(head)
+    body_name = get_dex().get_display_name(body)
     analysis.add_issue(PokemonNames(head_name, body_name))
 
 
 def handle_pokemon_name(analysis: Analysis, base_id: str, egg_sprite: bool = False):
-    pokemon_name = NAME_MAP.get(base_id)
+    pokemon_name = get_dex().get_display_name(base_id)
     if egg_sprite:
         analysis.add_issue(EggSprite(pokemon_name))
     else:
@@ -0,0 +1,78 @@
+from discord.colour import Colour
+from discord.embeds import Embed
+
+from bot.misc.enums import DiscordColour, Severity
+from .analysis_result import AnalysisResult
+
+DICT_SEVERITY_COLOUR = {
+    Severity.accepted : DiscordColour.green,
+    Severity.ignored : DiscordColour.orange,
+    Severity.controversial : DiscordColour.pink,
+    Severity.refused : DiscordColour.red
+}
+
+
+def render_embed(result: AnalysisResult) -> Embed:
+    embed = Embed()
+    apply_description(embed, result)
+    apply_title(embed, result)
+    apply_colour(embed, result)
+    apply_author(embed, result)
+    apply_footer(embed, result)
+    apply_image(embed, result)
+    apply_thumbnail(embed, result)
+    return embed
+
+
+def render_transparency_embed() -> Embed:
+    return get_bonus_embed(DiscordColour.pink.value, "Semi transparent pixel location:")
+
+
+def render_half_pixels_embed() -> Embed:
+    return get_bonus_embed(DiscordColour.red.value, "Half pixel location:")
+
+
+def apply_title(embed: Embed, result: AnalysisResult):
+    if result.id_and_letter:
+        embed.title = f"__{result.severity.value}: {result.id_and_letter}__"
+    else:
+        embed.title = f"__{result.severity.value}:__"
+
+
+def apply_colour(embed: Embed, result: AnalysisResult):
+    embed.colour = DICT_SEVERITY_COLOUR.get(result.severity, DiscordColour.gray).value
+
+
+def apply_description(embed: Embed, result: AnalysisResult):
+    embed.description = f"{str(result.get_issues())}\n[Link to message]({result.jump_url})"
+
+
+def apply_author(embed: Embed, result: AnalysisResult):
+    embed.set_author(name=result.author_name, icon_url=result.author_avatar_url)
+
+
+def apply_footer(embed: Embed, result: AnalysisResult):
+    if result.first_line:
+        embed.set_footer(text=result.first_line)
+
+
+def apply_image(embed: Embed, result: AnalysisResult):
+    if not result.autogen_available:
+        return
+    embed.set_image(url="attachment://image.png")
+    embed.description = (embed.description
+                         + "\n\n**Autogen version:** (do not use as reference)")
+
+
+def apply_thumbnail(embed: Embed, result: AnalysisResult):
+    if result.attachment_url is not None:
+        embed.set_thumbnail(url=result.attachment_url)
+
+
+def get_bonus_embed(discord_colour:Colour, title: str|None = None) -> Embed:
+    bonus_embed = Embed()
+    if title:
+        bonus_embed.title = title
+    bonus_embed.colour = discord_colour
+    bonus_embed.set_image(url="attachment://image.png")
+    return bonus_embed
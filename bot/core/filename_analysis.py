@@ -3,24 +3,17 @@ import re
 from bot.misc.enums import IdType
 import bot.misc.utils as utils
 
-LETTER_AND_PNG_PATTERN = rf'{utils.LETTER}\.png$'
-
-FILENAME_FUSION_ID = utils.NUMBER_PATTERN_FUSION_ID + LETTER_AND_PNG_PATTERN
-FILENAME_CUSTOM_ID = utils.NUMBER_PATTERN_CUSTOM_ID + LETTER_AND_PNG_PATTERN
-FILENAME_TRIPLE_ID = utils.NUMBER_PATTERN_TRIPLE_ID + LETTER_AND_PNG_PATTERN
-FILENAME_EGG_ID    = utils.NUMBER_PATTERN_EGG_ID    + LETTER_AND_PNG_PATTERN
-
-REGULAR_PATTERN_FUSION_ID = rf'^{FILENAME_FUSION_ID}'
-SPOILER_PATTERN_FUSION_ID = rf'^SPOILER_{FILENAME_FUSION_ID}'
-
-REGULAR_PATTERN_CUSTOM_ID = rf'^{FILENAME_CUSTOM_ID}'
-SPOILER_PATTERN_CUSTOM_ID = rf'^SPOILER_{FILENAME_CUSTOM_ID}'
-
-REGULAR_PATTERN_TRIPLE_ID = rf'^{FILENAME_TRIPLE_ID}'
-SPOILER_PATTERN_TRIPLE_ID = rf'^SPOILER_{FILENAME_TRIPLE_ID}'
-
-REGULAR_PATTERN_EGG_ID = rf'^{FILENAME_EGG_ID}'
-SPOILER_PATTERN_EGG_ID = rf'^SPOILER_{FILENAME_EGG_ID}'
+# Every filename format in a single pass, in the order they used to be tried: fusion, custom base, triple, egg.
+# Only one of the id groups is set after a match, and its name is also the name of the IdType.
+FILENAME_PATTERN = re.compile(
+    rf'^(?:SPOILER_)?(?:'
+    rf'(?P<fusion>{utils.DEX_ID}\.{utils.DEX_ID})(?P<fusion_letter>{utils.LETTER})'
+    rf'|(?P<custom_base>{utils.DEX_ID})(?P<custom_base_letter>{utils.LETTER})'
+    rf'|(?P<triple>{utils.DEX_ID}\.{utils.DEX_ID}\.{utils.DEX_ID})(?P<triple_letter>{utils.LETTER})'
+    rf'|(?P<egg>{utils.DEX_ID})_egg(?P<egg_letter>{utils.LETTER})'
+    rf')\.png$'
+)
+FILENAME_ID_TYPES = [IdType.fusion, IdType.custom_base, IdType.triple, IdType.egg]
 
 class FusionFilename:
     full_filename: str|None
@@ -28,15 +21,15 @@ class FusionFilename:
     dex_ids: str|None
     letter: str|None
 
-    def __init__(self,  filename: str, id_type: IdType):
+    def __init__(self,  filename: str, id_type: IdType, dex_ids: str|None = None, letter: str|None = None):
         self.full_filename = remove_spoiler(filename)
         self.id_type = id_type
         if self.id_type.is_unknown():
             self.dex_ids = None
             self.letter = None
             return
-        self.dex_ids = utils.get_clean_dex_ids(self.full_filename, id_type)
-        self.letter = grab_letter(self.full_filename, self.dex_ids)
+        self.dex_ids = dex_ids
+        self.letter = letter
 
     def id_and_letter(self) -> str|None:
         if self.id_type.is_unknown() or self.full_filename is None:
@@ -58,53 +51,15 @@ def remove_spoiler(filename: str) -> str|None:
     return filename.replace("SPOILER_", "")
 
 
-def grab_letter(filename: str, dex_ids: str) -> str|None:
-    # If we reach this point, the filename is standard and any letter will only be the correct one
-    remove_rest = (filename.replace("_egg", "")
-                   .replace(".png", "")
-                   .replace(dex_ids, ""))
-    return remove_rest
-
-
 def get_fusion_filename(filename: str) -> FusionFilename:
-
-    # Search for fusion pattern
-    result = re.match(REGULAR_PATTERN_FUSION_ID, filename)
-    if result is not None:
-        return FusionFilename(filename, IdType.fusion)
-
-    result = re.match(SPOILER_PATTERN_FUSION_ID, filename)
-    if result is not None:
-        return FusionFilename(filename, IdType.fusion)
-
-    # Search for custom base or egg pattern
-    result = re.match(REGULAR_PATTERN_CUSTOM_ID, filename)
-    if result is not None:
-        return FusionFilename(filename, IdType.custom_base)
-
-    result = re.match(SPOILER_PATTERN_CUSTOM_ID, filename)
-    if result is not None:
-        return FusionFilename(filename, IdType.custom_base)
-
-    # Search for triple fusion pattern
-    result = re.match(REGULAR_PATTERN_TRIPLE_ID, filename)
-    if result is not None:
-        return FusionFilename(filename, IdType.triple)
-
-    result = re.match(SPOILER_PATTERN_TRIPLE_ID, filename)
-    if result is not None:
-        return FusionFilename(filename, IdType.triple)
-
-    # Search for new egg pattern
-    result = re.match(REGULAR_PATTERN_EGG_ID, filename)
-    if result is not None:
-        return FusionFilename(filename, IdType.egg)
-
-    result = re.match(SPOILER_PATTERN_EGG_ID, filename)
-    if result is not None:
-        return FusionFilename(filename, IdType.egg)
-    else:
+    result = FILENAME_PATTERN.match(filename)
+    if result is None:
         return FusionFilename("", IdType.unknown)
+    for id_type in FILENAME_ID_TYPES:
+        dex_ids = result.group(id_type.name)
+        if dex_ids is not None:
+            return FusionFilename(filename, id_type, dex_ids, result.group(f"{id_type.name}_letter"))
+    return FusionFilename("", IdType.unknown)
 
 
 def get_filename_from_zigzag_image_url(url: str):
@@ -1,20 +1,21 @@
-import re
 import string
-from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
 
 from discord import Message
 
 from bot.context.setup import ctx
 from bot.core.analysis import Analysis
+from bot.core.analysis_input import AnalysisInput
 from bot.core.content_analysis import handle_dex_verification
 from bot.core.filename_analysis import FusionFilename
+from bot.core.gallery_index import gallery_index, last_day_of_previous_month
 from bot.core.issues import MissingMessageId, UnknownSprite, DifferentFilenameIds, DifferentSprite, IncorrectGallery, \
     FileName, WrongLetter, OutOfDex, PokemonNameNotFound, MissingLetters
 from bot.misc import utils
+from bot.misc.dex import get_dex
+from bot.misc.name_matcher import PokemonNameMatcher
+from bot.misc.timings import Span
 
-NAME_MAP: dict[str, str] = utils.id_to_name_map()
-TYPOS_MAP: dict[str, list[str]] = utils.id_to_typos_map()
+NAME_MATCHER = PokemonNameMatcher(get_dex().id_to_all_names_map())
 
 
 async def main(analysis_list: list[Analysis]):
@@ -38,7 +39,7 @@ def same_id_checks(analysis_list: list[Analysis]):
     if first_filename.id_type.is_unknown():
         unknown_sprite(first_analysis)
         return
-    content_ids = utils.extract_fusion_ids_from_content(first_analysis.message, first_filename.id_type)
+    content_ids = utils.extract_fusion_ids_from_content(first_analysis.input.content, first_filename.id_type)
     if not content_ids:
         first_analysis.add_issue(MissingMessageId())
         return
@@ -99,35 +100,17 @@ def pokemon_name_checks(analysis_list: list[Analysis]):
 
 
 def ensure_pokemon_names_appear(analysis: Analysis):
+    mentioned_ids = NAME_MATCHER.find_ids(analysis.input.content)
     for pokemon_id in analysis.fusion_filename.ids_list():
-        check_name_in_message(pokemon_id, analysis)
-
-
-def check_name_in_message(pokemon_id: str, analysis: Analysis):
-    message_content = analysis.message.content.lower()
-    clean_name = NAME_MAP.get(pokemon_id)
-    clean_name_result = re.search(clean_name.lower(), message_content)
-    if clean_name_result is not None:
-        return
-    typos_found = check_typos_in_message(pokemon_id, message_content)
-    if not typos_found:
-        analysis.add_issue(PokemonNameNotFound(clean_name))
-
-
-def check_typos_in_message(pokemon_id: str, message_content: str) -> bool:
-    typos: list[str] = TYPOS_MAP.get(pokemon_id)
-    for typo in typos:
-        typo_result = re.search(typo.lower(), message_content)
-        if typo_result is not None:
-            return True
-    return False
+        if pokemon_id not in mentioned_ids:
+            analysis.add_issue(PokemonNameNotFound(get_dex().get_display_name(pokemon_id)))
 
 
 async def filename_letter_checks(analysis_list: list[Analysis]):
     """Ensures that in a given month, the same fusion by the same user follows a certain alt letter pattern"""
     past_instances = await search_in_same_month(analysis_list[0])
     if past_instances > 26:
-        await ctx().doodledoo.debug.send(f"Too many gallery instances: ({analysis_list[0].message.jump_url})")
+        await ctx().doodledoo.debug.send(f"Too many gallery instances: ({analysis_list[0].input.jump_url})")
         return
     if len(analysis_list) == 1:
         await ensure_correct_letter(analysis_list[0], past_instances)
@@ -141,23 +124,22 @@ async def search_in_same_month(analysis: Analysis) -> int:
     else:
         gallery_channel = ctx().pif.assets
 
+    if gallery_index.ready:
+        with Span("gallery.index_count"):
+            return gallery_index.count_instances(gallery_channel.id, analysis.input.author_id,
+                                                 analysis.fusion_filename.dex_ids, analysis.input.message_id)
+
+    # The index is still being filled from the channel history after startup
     match_count = 0
-    async for message in gallery_channel.history(after=last_day_of_previous_month()):
-        match_count += same_fusion_and_author_instances(message, analysis.message, analysis.fusion_filename.dex_ids)
+    with Span("gallery.history_scan"):
+        async for message in gallery_channel.history(after=last_day_of_previous_month()):
+            match_count += same_fusion_and_author_instances(message, analysis.input, analysis.fusion_filename.dex_ids)
     return match_count
 
 
-def last_day_of_previous_month() -> datetime:
-    # Gallery cutoff: Midnight EST when a new month starts
-    est_tz = ZoneInfo("America/New_York")
-    now = datetime.now(est_tz)
-    first_day_of_current_month = datetime(now.year, now.month, 1, tzinfo=est_tz)
-    return first_day_of_current_month - timedelta(days=1)
-
-
-def same_fusion_and_author_instances(message: Message, og_message: Message, id_to_find: str) -> int:
-    same_message_id = og_message.id
-    author_id = og_message.author.id
+def same_fusion_and_author_instances(message: Message, analysis_input: AnalysisInput, id_to_find: str) -> int:
+    same_message_id = analysis_input.message_id
+    author_id = analysis_input.author_id
     if message.author.id != author_id:
         return 0
     if message.id == same_message_id:
@@ -171,7 +153,7 @@ async def ensure_correct_letter(analysis: Analysis, past_instances: int):
     if past_instances == 0:
         correct_letter = ""
     elif past_instances > 26:
-        await ctx().doodledoo.debug.send(f"Too many gallery instances: ({analysis.message.jump_url})")
+        await ctx().doodledoo.debug.send(f"Too many gallery instances: ({analysis.input.jump_url})")
         return
     else:
         correct_letter = string.ascii_lowercase[past_instances - 1]
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from discord import Message, TextChannel, Object
+from discord.utils import snowflake_time
+
+from bot.misc import utils
+from .gallery_store import GalleryStore, PostRow
+
+
+class GalleryIndex:
+    """Attachment counts of this month's gallery posts per (channel, author, fusion id), kept up to date
+    with message events so that the alt letter checks don't need to scan the channel history"""
+    store: GalleryStore|None
+    cutoff: datetime
+    ready: bool
+
+    def __init__(self):
+        self.store = None
+        self.cutoff = last_day_of_previous_month()
+        self.ready = False
+
+    def get_store(self) -> GalleryStore:
+        if self.store is None:
+            self.store = GalleryStore()
+            self.store.delete_older_posts(self.cutoff.timestamp())
+        return self.store
+
+    async def catch_up(self, channels: list[TextChannel]):
+        """Reads the history newer than the last stored message of each channel.
+        Live posts stored meanwhile don't move the catch-up points, only a finished read of the history does."""
+        for channel in channels:
+            last_message_id = None
+            async for message in channel.history(limit=None, after=self.get_catch_up_point(channel.id),
+                                                 oldest_first=True):
+                self.add_message(message)
+                last_message_id = message.id
+            if last_message_id is not None:
+                self.get_store().advance_last_message_id(channel.id, last_message_id)
+        self.get_store().flush()
+        self.ready = True
+
+    def get_catch_up_point(self, channel_id: int) -> datetime|Object:
+        last_message_id = self.get_store().get_last_message_id(channel_id)
+        if last_message_id is None or snowflake_time(last_message_id) <= self.cutoff:
+            return self.cutoff
+        return Object(id=last_message_id)
+
+    def add_message(self, message: Message):
+        self.handle_month_change()
+        if message.created_at <= self.cutoff:
+            return
+        rows = get_post_rows(message)
+        self.get_store().put_post(message.id, rows)
+        if self.ready:
+            # Once caught up, live events cover everything older
+            self.get_store().advance_last_message_id(message.channel.id, message.id)
+
+    def remove_message(self, message_id: int):
+        self.get_store().delete_post(message_id)
+
+    def count_instances(self, channel_id: int, author_id: int, fusion_id: str, excluded_message_id: int) -> int:
+        self.handle_month_change()
+        return self.get_store().count_instances(channel_id, author_id, fusion_id,
+                                                excluded_message_id, self.cutoff.timestamp())
+
+    def handle_month_change(self):
+        current_cutoff = last_day_of_previous_month()
+        if current_cutoff == self.cutoff:
+            return
+        self.cutoff = current_cutoff
+        self.get_store().delete_older_posts(current_cutoff.timestamp())
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+
+def get_post_rows(message: Message) -> list[PostRow]:
+    id_to_letter = utils.extract_all_ids_from_content(message.content)
+    timestamp = message.created_at.timestamp()
+    attachment_count = len(message.attachments)
+    return [(message.id, message.channel.id, message.author.id, fusion_id, letter, timestamp, attachment_count)
+            for fusion_id, letter in id_to_letter.items()]
+
+
+def last_day_of_previous_month() -> datetime:
+    # Gallery cutoff: Midnight EST when a new month starts
+    est_tz = ZoneInfo("America/New_York")
+    now = datetime.now(est_tz)
+    first_day_of_current_month = datetime(now.year, now.month, 1, tzinfo=est_tz)
+    return first_day_of_current_month - timedelta(days=1)
+
+
+gallery_index = GalleryIndex()
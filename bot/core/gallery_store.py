@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import time
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+GALLERY_DB_FILE = os.path.join(CURRENT_DIR, "..", "..", "data", "GalleryIndex.sqlite3")
+
+WRITE_BATCH_SIZE = 100      # Pending writes before they're committed in a single transaction
+WRITE_FLUSH_INTERVAL = 5    # In seconds, max age of pending writes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS gallery_posts (
+    message_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    fusion_id TEXT NOT NULL,
+    letter TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    attachment_count INTEGER NOT NULL,
+    PRIMARY KEY (message_id, fusion_id)
+);
+CREATE INDEX IF NOT EXISTS gallery_posts_by_fusion
+    ON gallery_posts (channel_id, author_id, fusion_id, timestamp);
+CREATE INDEX IF NOT EXISTS gallery_posts_by_timestamp
+    ON gallery_posts (timestamp);
+CREATE TABLE IF NOT EXISTS gallery_channels (
+    channel_id INTEGER PRIMARY KEY,
+    last_message_id INTEGER NOT NULL
+);
+"""
+
+# (message_id, channel_id, author_id, fusion_id, letter, timestamp, attachment_count)
+PostRow = tuple[int, int, int, str, str, float, int]
+
+
+class GalleryStore:
+    """Gallery post rows kept in SQLite, so the month index survives restarts"""
+    connection: sqlite3.Connection
+    pending_writes: list[tuple[int, list[PostRow]|None]]
+    pending_catch_up_points: dict[int, int]
+    last_flush: float
+
+    def __init__(self, db_file: str = GALLERY_DB_FILE):
+        self.connection = sqlite3.connect(db_file)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.pending_writes = []
+        self.pending_catch_up_points = {}
+        self.last_flush = time.monotonic()
+
+    def put_post(self, message_id: int, rows: list[PostRow]):
+        """Replaces the rows of the message, even if it doesn't mention any fusion anymore"""
+        self.pending_writes.append((message_id, rows))
+        self.handle_flushing()
+
+    def delete_post(self, message_id: int):
+        self.pending_writes.append((message_id, None))
+        self.handle_flushing()
+
+    def advance_last_message_id(self, channel_id: int, message_id: int):
+        """Only for messages when everything older in the channel is already stored,
+        the next startup reads the history from here"""
+        current_point = self.pending_catch_up_points.get(channel_id, 0)
+        self.pending_catch_up_points[channel_id] = max(current_point, message_id)
+        self.handle_flushing()
+
+    def handle_flushing(self):
+        batch_full = len(self.pending_writes) + len(self.pending_catch_up_points) >= WRITE_BATCH_SIZE
+        batch_old = time.monotonic() - self.last_flush >= WRITE_FLUSH_INTERVAL
+        if batch_full or batch_old:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.pending_writes and not self.pending_catch_up_points:
+            return
+        with self.connection:
+            for message_id, rows in self.pending_writes:
+                self.connection.execute("DELETE FROM gallery_posts WHERE message_id = ?", (message_id,))
+                if rows is not None:
+                    self.connection.executemany(
+                        "INSERT INTO gallery_posts VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            # Same transaction as the posts, so a catch-up point is never stored without the posts before it
+            self.connection.executemany(
+                "INSERT INTO gallery_channels VALUES (?, ?) ON CONFLICT (channel_id) "
+                "DO UPDATE SET last_message_id = MAX(last_message_id, excluded.last_message_id)",
+                self.pending_catch_up_points.items())
+        self.pending_writes = []
+        self.pending_catch_up_points = {}
+
+    def count_instances(self, channel_id: int, author_id: int, fusion_id: str,
+                        excluded_message_id: int, after_timestamp: float) -> int:
+        self.flush()
+        cursor = self.connection.execute(
+            "SELECT COALESCE(SUM(attachment_count), 0) FROM gallery_posts "
+            "WHERE channel_id = ? AND author_id = ? AND fusion_id = ? AND timestamp > ? AND message_id != ?",
+            (channel_id, author_id, fusion_id, after_timestamp, excluded_message_id))
+        return cursor.fetchone()[0]
+
+    def get_last_message_id(self, channel_id: int) -> int|None:
+        self.flush()
+        cursor = self.connection.execute(
+            "SELECT last_message_id FROM gallery_channels WHERE channel_id = ?", (channel_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def delete_older_posts(self, timestamp: float):
+        self.flush()
+        with self.connection:
+            self.connection.execute("DELETE FROM gallery_posts WHERE timestamp <= ?", (timestamp,))
+
+    def close(self):
+        self.flush()
+        self.connection.close()
@@ -1,5 +1,10 @@
+from typing import Any
+
 from bot.misc.enums import Description, Severity, IdType
 
+# (issue class name, its attributes as (name, value) pairs)
+IssueRecord = tuple[str, tuple[tuple[str, Any], ...]]
+
 
 class Issue:
     description: Description
@@ -8,6 +13,9 @@ class Issue:
     def __str__(self) -> str:
         return self.description.value
 
+    def to_record(self) -> IssueRecord:
+        return type(self).__name__, tuple(vars(self).items())
+
 
 class Issues:
     issue_list: list[Issue]
@@ -174,6 +182,17 @@ class NotPng(Issue):
         return f"{self.description.value}: {self.file_format}"
 
 
+class FileTooLarge(Issue):
+    description = Description.file_too_large
+    severity = Severity.refused
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+
+    def __str__(self) -> str:
+        return f"{self.description.value} (over {self.max_size // (1024 * 1024)}MB)"
+
+
 class InvalidSize(Issue):
     description = Description.invalid_size
     severity = Severity.refused
@@ -327,4 +346,16 @@ class HalfPixels(Issue):
 
 class MisplacedGrid(Issue):
     description = Description.misplaced_grid
-    severity = Severity.accepted
\ No newline at end of file
+    severity = Severity.accepted
+
+
+def issue_from_record(issue_record: IssueRecord) -> Issue:
+    """Rebuilds the issue as it was, without going through its constructor again"""
+    issue_code, issue_args = issue_record
+    issue_class = ISSUE_TYPES[issue_code]
+    issue = issue_class.__new__(issue_class)
+    issue.__dict__.update(issue_args)
+    return issue
+
+
+ISSUE_TYPES: dict[str, type[Issue]] = {issue_type.__name__: issue_type for issue_type in Issue.__subclasses__()}
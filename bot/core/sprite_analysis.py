@@ -1,33 +1,23 @@
+from io import BytesIO
+
 import numpy
-import requests
-from PIL.Image import Image, new
+from PIL.Image import Image, new, fromarray
 from PIL.Image import open as image_open
-from PIL.PyAccess import PyAccess
 
 from bot.context.message_identifier import is_intentional_transparency
+from bot.misc.enums import IdType
 from bot.misc.exceptions import TransparencyException
+from bot.misc.timings import Span
+from . import color_similarity
 from .analysis import Analysis
-from .issues import (AsepriteUser, ColorAmount, ColorExcessControversial,
+from .issues import (Issue, AsepriteUser, ColorAmount, ColorExcessControversial,
                      ColorExcessRefused, ColorOverExcess, GraphicsGaleUser,
                      HalfPixels, InvalidSize, MissingTransparency,
                      SimilarityAmount, SemiTransparency, SimilarityExcessControversial, SimilarityExcessRefused,
                      MisplacedGrid, NotPng, IntentionalTransparency, TransparentAmount)
 
-
-def patch_asscalar(a):
-    return a.item()
-
-
-setattr(numpy, "asscalar", patch_asscalar)
-
-from colormath.color_objects import sRGBColor, LabColor
-from colormath.color_conversions import convert_color
-from colormath.color_diff import delta_e_cie2000, delta_e_cmc
-
 colorType = int | tuple
 
-TIMEOUT = 10
-
 MAX_SIZE = 288
 EGG_SIZE = 160
 
@@ -49,21 +39,51 @@ STEP = 3
 EGG_STEP = 2
 ASEPRITE_RATIO = 2
 
+# The overlays are mostly big flat areas, so a fast zlib level barely makes them any bigger
+OVERLAY_COMPRESS_LEVEL = 1
+
 PINK = (255, 0, 255, 255)
 BLACK = (0, 0, 0, 255)
 WHITE = (255, 255, 255, 255)
 RED = (255, 0, 0, 255)
 GREEN = (0, 255, 0, 255)
+CLEAR = (0, 0, 0, 0)
+
+# Overlays are palette images, so each pixel takes one byte in memory and two bits in the PNG
+TRANSPARENCY_PALETTE = [BLACK, PINK, WHITE]
+HALF_PIXELS_PALETTE = [CLEAR, RED, GREEN]
+
+
+class SpriteResult:
+    """Picklable outcome of the pixel checks of a single sprite, which only depends on the image
+    and its id type. It gets merged into the analysis with apply_sprite_result."""
+    issues: list[Issue]
+    ai_suspicion: int
+    size_issue: bool
+    transparency_issue: bool
+    transparency_png: bytes|None
+    half_pixels_issue: bool
+    half_pixels_png: bytes|None
+    stage_times: dict[str, float]   # Seconds spent in each stage, recorded by the bot when timings are enabled
+
+    def __init__(self):
+        self.issues = []
+        self.ai_suspicion = 0
+        self.size_issue = False
+        self.transparency_issue = False
+        self.transparency_png = None
+        self.half_pixels_issue = False
+        self.half_pixels_png = None
+        self.stage_times = {}
+
+    def add_issue(self, issue: Issue):
+        self.issues.append(issue)
 
 
 class SpriteContext():
-    def __init__(self, analysis: Analysis):
-        if analysis.attachment_url is None:
-            raise RuntimeError()
-
-        raw_data = requests.get(analysis.attachment_url, stream=True, timeout=TIMEOUT).raw
-        self.image = image_open(raw_data)
-        self.pixels = get_pixels(self.image)
+    def __init__(self, image_bytes: bytes, id_type: IdType):
+        self.image = image_open(BytesIO(image_bytes))
+        self.pixel_array = get_pixel_array(self.image)
 
         self.color_count: int = 0
         self.transparent_count: int = 0
@@ -73,7 +93,7 @@ class SpriteContext():
         self.useful_colors: list = []
         self.similar_color_dict: dict = {}
 
-        if analysis.fusion_filename.id_type.is_custom_base():
+        if id_type.is_custom_base():
             self.refused_color_lim = CUSTOM_BASE_REFUSED_COLOR_LIMIT
             self.controv_color_lim = CUSTOM_BASE_CONTROV_COLOR_LIMIT
             self.refused_sim_lim = CUSTOM_BASE_REFUSED_SIM_LIMIT
@@ -84,7 +104,7 @@ class SpriteContext():
             self.refused_sim_lim = REFUSED_SIMILARITY_LIMIT
             self.controv_sim_lim = CONTROVERSIAL_SIMILARITY_LIMIT
 
-        if analysis.fusion_filename.id_type.is_egg():
+        if id_type.is_egg():
             self.max_size = EGG_SIZE
             self.step =  EGG_STEP
         else:
@@ -93,53 +113,54 @@ class SpriteContext():
 
         self.valid_size = (self.max_size, self.max_size)
 
-    def handle_sprite_format(self, analysis:Analysis):
+    def handle_sprite_format(self, result: SpriteResult):
         # Ensures that the image is actually a png
         file_format = self.image.format
         if file_format != "PNG":
-            analysis.add_issue(NotPng(file_format))
+            result.add_issue(NotPng(file_format))
 
     def turn_image_into_rgb(self):
         # Avoids having to deal with indexed palette quirks
         if self.image.mode != "RGBA":
             self.image = self.image.convert(mode="RGBA")
 
-    def handle_sprite_size(self, analysis: Analysis):
+    def handle_sprite_size(self, result: SpriteResult):
         image_size = self.image.size
         if image_size == self.valid_size:
-            analysis.ai_suspicion -= 4
+            result.ai_suspicion -= 4
             return
 
-        analysis.size_issue = True
-        analysis.add_issue(InvalidSize(image_size))
+        result.size_issue = True
+        result.add_issue(InvalidSize(image_size))
         if image_size == (1024, 1024):
-            analysis.ai_suspicion += 8
+            result.ai_suspicion += 8
         elif image_size == (96, 96):
-            analysis.ai_suspicion -= 2
+            result.ai_suspicion -= 2
 
-    def handle_sprite_colors(self, analysis: Analysis):
-        all_colors = self.image.getcolors(ALL_COLOR_LIMIT)
+    def handle_sprite_colors(self, result: SpriteResult):
+        with Span("sprite.getcolors", result.stage_times):
+            all_colors = self.image.getcolors(ALL_COLOR_LIMIT)
         if is_color_excess(all_colors):
-            analysis.add_issue(ColorOverExcess(ALL_COLOR_LIMIT))
-            analysis.ai_suspicion += 6
+            result.add_issue(ColorOverExcess(ALL_COLOR_LIMIT))
+            result.ai_suspicion += 6
         else:
-            self.handle_color_count(analysis, all_colors)
-            self.handle_color_limit(analysis)
+            self.handle_color_count(result, all_colors)
+            self.handle_color_limit(result)
             if self.actual_color_count <= self.refused_color_lim:
-                self.handle_color_similarity(analysis)
-            self.handle_aseprite(analysis)
-            self.handle_graphics_gale(analysis)
-            analysis.ai_suspicion -= 2
+                self.handle_color_similarity(result)
+            self.handle_aseprite(result)
+            self.handle_graphics_gale(result)
+            result.ai_suspicion -= 2
 
-    def handle_color_count(self, analysis: Analysis, all_colors: list):
+    def handle_color_count(self, result: SpriteResult, all_colors: list):
         try:
             self.useful_colors = remove_useless_colors(all_colors)
-            self.handle_color_amount(analysis, all_colors)
+            self.handle_color_amount(result, all_colors)
         except TransparencyException:
-            analysis.add_issue(MissingTransparency())
-            analysis.ai_suspicion += 4
+            result.add_issue(MissingTransparency())
+            result.ai_suspicion += 4
 
-    def handle_color_amount(self, analysis: Analysis, all_colors):
+    def handle_color_amount(self, result: SpriteResult, all_colors):
         # Count all transparent and opaque pixels.
         self.color_count = len(set(c[1][0:3] for c in self.useful_colors))
         self.transparent_count = len(list(c[1] for c in self.useful_colors if c[1][3] < 255 and sum(c[1][0:3]) > 0))
@@ -148,54 +169,55 @@ class SpriteContext():
 
         # Add an issue stating the amount of colors in the sprite.
         if self.transparent_count:
-            analysis.add_issue(ColorAmount(self.color_count))
-            analysis.add_issue(TransparentAmount(self.transparent_count))
+            result.add_issue(ColorAmount(self.color_count))
+            result.add_issue(TransparentAmount(self.transparent_count))
         else:
-            analysis.add_issue(ColorAmount(self.actual_color_count))
+            result.add_issue(ColorAmount(self.actual_color_count))
 
-    def handle_color_similarity(self, analysis: Analysis):
-        similarity_amount = self.get_similarity_amount()
-        analysis.add_issue(SimilarityAmount(similarity_amount))
+    def handle_color_similarity(self, result: SpriteResult):
+        with Span("sprite.similarity", result.stage_times):
+            similarity_amount = self.get_similarity_amount()
+        result.add_issue(SimilarityAmount(similarity_amount))
         if similarity_amount > self.refused_sim_lim:
-            analysis.add_issue(SimilarityExcessRefused(self.refused_sim_lim))
+            result.add_issue(SimilarityExcessRefused(self.refused_sim_lim))
         elif similarity_amount > self.controv_sim_lim:
-            analysis.add_issue(SimilarityExcessControversial(self.controv_sim_lim))
+            result.add_issue(SimilarityExcessControversial(self.controv_sim_lim))
 
-    def handle_color_limit(self, analysis: Analysis):
+    def handle_color_limit(self, result: SpriteResult):
         if self.actual_color_count > self.refused_color_lim:
-            analysis.add_issue(ColorExcessRefused(self.refused_color_lim))
+            result.add_issue(ColorExcessRefused(self.refused_color_lim))
         elif self.actual_color_count > self.controv_color_lim:
-            analysis.add_issue(ColorExcessControversial(self.controv_color_lim))
+            result.add_issue(ColorExcessControversial(self.controv_color_lim))
 
-    def handle_aseprite(self, analysis: Analysis):
+    def handle_aseprite(self, result: SpriteResult):
         if self.actual_color_count != 0:
             aseprite_ratio = self.useless_amount / self.actual_color_count
             if aseprite_ratio > ASEPRITE_RATIO:
-                analysis.add_issue(AsepriteUser(aseprite_ratio))
+                result.add_issue(AsepriteUser(aseprite_ratio))
 
-    def handle_graphics_gale(self, analysis: Analysis):
+    def handle_graphics_gale(self, result: SpriteResult):
         is_graphics_gale = "GLDPNG" in self.image.info.get("Software", "")
         if is_graphics_gale:
-            analysis.add_issue(GraphicsGaleUser())
+            result.add_issue(GraphicsGaleUser())
 
-    def handle_sprite_transparency(self, analysis: Analysis):
-        if analysis.size_issue:
+    def handle_sprite_transparency(self, result: SpriteResult):
+        if result.size_issue:
             return
 
         try:
-            transparency_amount, image = self.highlight_transparency()
+            with Span("sprite.transparency", result.stage_times):
+                transparency_amount, image = self.highlight_transparency()
         except TransparencyException:
             return
 
         if transparency_amount == 0:
             return
 
-        if is_intentional_transparency(analysis.message):
-            analysis.add_issue(IntentionalTransparency())
-            return
-        analysis.transparency_issue = True
-        analysis.transparency_image = image
-        analysis.add_issue(SemiTransparency())
+        # Intentional transparency depends on the message, so it's handled in apply_sprite_result
+        result.transparency_issue = True
+        with Span("sprite.png_encoding", result.stage_times):
+            result.transparency_png = generate_png_bytes(image)
+        result.add_issue(SemiTransparency())
 
 
     def get_similarity_amount(self):
@@ -208,80 +230,79 @@ class SpriteContext():
             similarity_amount = -1
         return similarity_amount
 
-    def handle_sprite_half_pixels(self, analysis: Analysis):
-        if analysis.size_issue:
+    def handle_sprite_half_pixels(self, result: SpriteResult):
+        if result.size_issue:
             return
 
-        half_pixels_amount, image = self.highlight_half_pixels(strict_grid=True)
+        with Span("sprite.half_pixels_strict", result.stage_times):
+            half_pixels_amount, image = self.highlight_half_pixels(strict_grid=True)
         if half_pixels_amount == 0:
             return
 
         # If the strict search returns half pixels, double check to check
         # if they are real, or it's just that the grid doesn't align
-        lax_half_pixels_amount = self.highlight_half_pixels(strict_grid=False)[0]
+        with Span("sprite.half_pixels_lax", result.stage_times):
+            lax_half_pixels_amount = self.count_half_pixels(strict_grid=False)
         if lax_half_pixels_amount > 0:
-            analysis.half_pixels_issue = True
-            analysis.half_pixels_image = image
-            analysis.add_issue(HalfPixels())
+            result.half_pixels_issue = True
+            with Span("sprite.png_encoding", result.stage_times):
+                result.half_pixels_png = generate_png_bytes(image)
+            result.add_issue(HalfPixels())
         else:
-            analysis.add_issue(MisplacedGrid())
+            result.add_issue(MisplacedGrid())
 
 
     def highlight_transparency(self) -> tuple[int, Image]:
         """# TransparencyException"""
-        local_image = new("RGBA", (self.max_size, self.max_size))
-        local_pixels = get_pixels(local_image)
-        first_pixel = self.pixels[0, 0]
-        transparency_amount = 0
-        is_there_transparency = False
-        if is_indexed(first_pixel):
-            return transparency_amount, local_image
-        for i in range(0, self.max_size):
-            for j in range(0, self.max_size):
-                color = self.pixels[i, j]
-                alpha = get_alpha(color)
-                if is_half_transparent(alpha):
-                    local_pixels[i, j] = PINK
-                    transparency_amount += 1
-                elif not is_transparent(alpha):
-                    local_pixels[i, j] = BLACK
-                else:
-                    local_pixels[i, j] = WHITE
-                    is_there_transparency = True
-        if not is_there_transparency:
+        if is_indexed_array(self.pixel_array):
+            return 0, new("RGBA", (self.max_size, self.max_size))
+        alpha = get_alpha_channel(self.pixel_array)
+        half_transparent = is_half_transparent(alpha)
+        transparent = is_transparent(alpha)
+        if not transparent.any():
             raise TransparencyException
-        return transparency_amount, local_image
+        overlay = numpy.zeros((self.max_size, self.max_size), dtype=numpy.uint8)     # BLACK
+        overlay[half_transparent] = TRANSPARENCY_PALETTE.index(PINK)
+        overlay[transparent] = TRANSPARENCY_PALETTE.index(WHITE)
+        transparency_amount = int(half_transparent.sum())
+        return transparency_amount, get_palette_image(overlay, TRANSPARENCY_PALETTE)
 
     def highlight_half_pixels(self, strict_grid:bool = False) -> tuple[int, Image]:
-        local_image = new("RGBA", (self.max_size, self.max_size))
-        local_pixels = get_pixels(local_image)
+        half_pixel_mask, delta_i, delta_j = self.get_half_pixel_mask(strict_grid)
+        half_pixels_amount = int(half_pixel_mask.sum()) * (self.step * self.step)
+        local_image = paint_half_pixel_mask(half_pixel_mask, delta_i, delta_j, self.max_size, self.step)
+        return half_pixels_amount, local_image
+
+    def count_half_pixels(self, strict_grid:bool = False) -> int:
+        """Same amount as highlight_half_pixels, without painting the overlay"""
+        half_pixel_mask = self.get_half_pixel_mask(strict_grid)[0]
+        return int(half_pixel_mask.sum()) * (self.step * self.step)
+
+    def get_half_pixel_mask(self, strict_grid: bool) -> tuple[numpy.ndarray, int, int]:
         if strict_grid:
             (delta_i, delta_j) = (0,0)
         else:
-            (delta_i, delta_j) = find_first_pixel(self.pixels, self.max_size)
-        max_i = self.max_size - (self.step - delta_i)
-        max_j = self.max_size - (self.step - delta_j)
-        half_pixels_amount = 0
-        for i in range(delta_i, max_i, self.step):
-            for j in range(delta_j, max_j, self.step):
-                color_set = get_color_set(i, j, self.pixels, self.step)
-                color = get_color_from_set(color_set)
-                recolor_pixels(i, j, local_pixels, color, self.step)
-                if color == RED:
-                    half_pixels_amount += (self.step * self.step)
-        return half_pixels_amount, local_image
+            (delta_i, delta_j) = find_first_pixel(self.pixel_array)
+        grid_cells = get_grid_cells(self.pixel_array, delta_i, delta_j, self.max_size, self.step)
+        return get_half_pixel_mask(grid_cells), delta_i, delta_j
 
 
 def get_similar_color_dict(rgb_color_list):
+    """# ValueError"""
     color_dict = {}
-    for color_a in rgb_color_list:
-        for color_b in rgb_color_list:
-            if color_a == color_b:
-                continue
-            color_delta = get_color_delta(color_a, color_b)
-            if is_similar(color_delta):
-                frozen_set = frozenset([color_a, color_b])
-                color_dict[frozen_set] = color_delta
+    rgb_array = color_similarity.get_rgb_array(rgb_color_list)
+    # Pairs further apart than the channel difference limit can never be similar, so they are skipped
+    index_a, index_b = color_similarity.get_near_pairs(rgb_array, DIFFERENCE_COLOR_LIMIT)
+    color_deltas = color_similarity.get_cached_color_deltas(rgb_color_list, index_a, index_b)
+    similar_pairs = is_similar(color_deltas)
+    # Filling the dict in pair order keeps the same keys, values and order as comparing one pair at a time
+    for pair_index in numpy.flatnonzero(similar_pairs):
+        color_a = rgb_color_list[index_a[pair_index]]
+        color_b = rgb_color_list[index_b[pair_index]]
+        if color_a == color_b:
+            continue
+        frozen_set = frozenset([color_a, color_b])
+        color_dict[frozen_set] = color_deltas[pair_index].tolist()
     return color_dict
 
 
@@ -313,18 +334,15 @@ def is_color_excess(color_list: list | None):
     return color_list is None
 
 
+# These work both on single alpha values and on whole alpha channel arrays
 def is_half_transparent(alpha):
-    return alpha != 0 and alpha != 255
+    return (alpha != 0) & (alpha != 255)
 
 
-def is_transparent(alpha: int) -> bool:
+def is_transparent(alpha):
     return alpha == 0
 
 
-def get_pixels(image: Image) -> PyAccess:
-    return image.load()  # type: ignore
-
-
 def remove_useless_colors(old_colors: list):
     """# TransparencyException"""
     new_colors = []
@@ -351,82 +369,126 @@ def get_alpha(color: tuple) -> int:
     return alpha
 
 
+def get_alpha_channel(pixel_array: numpy.ndarray) -> numpy.ndarray:
+    """# TransparencyException"""
+    if pixel_array.shape[2] != 4:
+        raise TransparencyException()
+    return pixel_array[:, :, 3]
+
+
 def is_indexed(color: colorType) -> bool:
     return isinstance(color, int)
 
 
-def find_first_pixel(pixels: PyAccess, max_size: int):
-    default_value = pixels[0, 0]
-    for i in range(0, max_size):
-        for j in range(0, max_size):
-            if default_value != pixels[i, j]:
-                return i % 3, j % 3
-    return 0, 0
+def is_indexed_array(pixel_array: numpy.ndarray) -> bool:
+    return pixel_array.shape[2] == 1
 
 
-def get_color_set(i: int, j: int, pixels: PyAccess, step: int):
-    color_set = set()
-    for increment_i in range(0, step):
-        for increment_j in range(0, step):
-            local_i = i + increment_i
-            local_j = j + increment_j
-            pixel = pixels[local_i, local_j]
-            # Equalize all colored fully transparent pixels
-            if (isinstance(pixel, tuple)
-                    and len(pixel) == 4
-                    and pixel[3] == 0):
-                pixel = (0, 0, 0, 0)
-            color_set.add(pixel)
-    return color_set
+def get_pixel_array(image: Image) -> numpy.ndarray:
+    # Always (height, width, channels), indexed images get a single channel
+    pixel_array = numpy.asarray(image)
+    if pixel_array.ndim == 2:
+        pixel_array = pixel_array[:, :, numpy.newaxis]
+    return pixel_array
 
 
-def get_color_from_set(color_set: set):
-    if len(color_set) > 1:
-        return RED
-    return GREEN
+def find_first_pixel(pixel_array: numpy.ndarray):
+    # Transposed so that the search goes column by column, like pixels[i, j] does
+    different_pixels = (pixel_array != pixel_array[0, 0]).any(axis=2).T
+    first_index = different_pixels.argmax()
+    if not different_pixels.flat[first_index]:
+        return 0, 0
+    i, j = numpy.unravel_index(first_index, different_pixels.shape)
+    return int(i) % 3, int(j) % 3
 
 
-def recolor_pixels(i: int, j: int, pixels: PyAccess, color: tuple, step: int):
-    for increment_i in range(0, step):
-        for increment_j in range(0, step):
-            local_i = i + increment_i
-            local_j = j + increment_j
-            pixels[local_i, local_j] = color
+def get_grid_cells(pixel_array: numpy.ndarray, delta_i: int, delta_j: int, max_size: int, step: int):
+    """Splits the sprite into (rows, step, columns, step, channels) blocks, one per grid cell"""
+    # Same bounds as iterating range(delta, max_size - (step - delta), step) on each axis
+    columns = len(range(delta_i, max_size - (step - delta_i), step))
+    rows = len(range(delta_j, max_size - (step - delta_j), step))
+    grid = pixel_array[delta_j:delta_j + rows * step, delta_i:delta_i + columns * step]
+    grid = equalize_transparent_pixels(grid)
+    return grid.reshape(rows, step, columns, step, grid.shape[2])
 
 
-def is_similar(color_delta):
-    if color_delta[0] > DELTA_COLOR_LIMIT:
-        return False
-    if color_delta[1] > DELTA_COLOR_LIMIT:
-        return False
-    if color_delta[2] > DIFFERENCE_COLOR_LIMIT:
-        return False
-    return True
+def equalize_transparent_pixels(pixel_array: numpy.ndarray) -> numpy.ndarray:
+    # Equalize all colored fully transparent pixels
+    if pixel_array.shape[2] != 4:
+        return pixel_array
+    return numpy.where(pixel_array[:, :, 3:] == 0, 0, pixel_array)
 
 
-def get_max_difference(rgb_a: tuple, rgb_b: tuple):
-    red_difference = abs(rgb_a[0] - rgb_b[0])
-    green_difference = abs(rgb_a[1] - rgb_b[1])
-    blue_difference = abs(rgb_a[2] - rgb_b[2])
-    return max(red_difference, green_difference, blue_difference)
+def get_half_pixel_mask(grid_cells: numpy.ndarray) -> numpy.ndarray:
+    # A cell has half pixels when any of its pixels differs from its top left one
+    top_left_pixels = grid_cells[:, :1, :, :1]
+    return (grid_cells != top_left_pixels).any(axis=(1, 3, 4))
 
 
-def get_color_delta(rgb_a: tuple, rgb_b: tuple):
-    color_rgb_a = sRGBColor(rgb_a[0], rgb_a[1], rgb_a[2], True)
-    color_rgb_b = sRGBColor(rgb_b[0], rgb_b[1], rgb_b[2], True)
-    color_lab_a = convert_color(color_rgb_a, LabColor)
-    color_lab_b = convert_color(color_rgb_b, LabColor)
-    cie2000 = delta_e_cie2000(color_lab_a, color_lab_b)
-    cmc = delta_e_cmc(color_lab_a, color_lab_b)
-    max_difference = get_max_difference(rgb_a, rgb_b)
-    return [int(cie2000), int(cmc), max_difference]
+def paint_half_pixel_mask(half_pixel_mask: numpy.ndarray, delta_i: int, delta_j: int,
+                          max_size: int, step: int) -> Image:
+    overlay = numpy.zeros((max_size, max_size), dtype=numpy.uint8)     # CLEAR
+    cell_colors = numpy.where(half_pixel_mask, HALF_PIXELS_PALETTE.index(RED), HALF_PIXELS_PALETTE.index(GREEN))
+    rows, columns = half_pixel_mask.shape
+    overlay[delta_j:delta_j + rows * step, delta_i:delta_i + columns * step] = (
+        cell_colors.astype(numpy.uint8).repeat(step, axis=0).repeat(step, axis=1))
+    return get_palette_image(overlay, HALF_PIXELS_PALETTE)
+
+
+def get_palette_image(overlay: numpy.ndarray, palette: list[tuple[int, int, int, int]]) -> Image:
+    image = fromarray(overlay, "P")
+    image.putpalette(bytes(channel for color in palette for channel in color), "RGBA")
+    return image
+
+
+def is_similar(color_delta):
+    # Works both on a single [cie2000, cmc, max_difference] delta and on an array of them
+    color_delta = numpy.asarray(color_delta)
+    return ((color_delta[..., 0] <= DELTA_COLOR_LIMIT)
+            & (color_delta[..., 1] <= DELTA_COLOR_LIMIT)
+            & (color_delta[..., 2] <= DIFFERENCE_COLOR_LIMIT))
+
+
+def generate_png_bytes(image: Image) -> bytes:
+    """Overlays are encoded once here, in the worker, and sent as they are"""
+    bytes_buffer = BytesIO()
+    image.save(bytes_buffer, format="PNG", compress_level=OVERLAY_COMPRESS_LEVEL)
+    return bytes_buffer.getvalue()
+
+
+def analyze_sprite(image_bytes: bytes, id_type: IdType) -> SpriteResult:
+    """Runs every pixel check. Only takes picklable data, so that it can run in a worker process."""
+    result = SpriteResult()
+    with Span("sprite.decoding", result.stage_times):
+        context = SpriteContext(image_bytes, id_type)
+        context.handle_sprite_format(result)
+        context.turn_image_into_rgb()
+    context.handle_sprite_size(result)
+    context.handle_sprite_colors(result)
+    context.handle_sprite_transparency(result)
+    context.handle_sprite_half_pixels(result)
+    return result
+
+
+def apply_sprite_result(analysis: Analysis, result: SpriteResult):
+    analysis.ai_suspicion += result.ai_suspicion
+    analysis.size_issue = result.size_issue
+    intentional_transparency = result.transparency_issue and is_intentional_transparency(analysis.input.content)
+    for issue in result.issues:
+        if isinstance(issue, SemiTransparency) and intentional_transparency:
+            analysis.add_issue(IntentionalTransparency())
+        else:
+            analysis.add_issue(issue)
+    if result.transparency_issue and not intentional_transparency:
+        analysis.transparency_issue = True
+        analysis.transparency_png = result.transparency_png
+    if result.half_pixels_issue:
+        analysis.half_pixels_issue = True
+        analysis.half_pixels_png = result.half_pixels_png
 
 
 def main(analysis: Analysis):
-    context = SpriteContext(analysis)
-    context.handle_sprite_format(analysis)
-    context.turn_image_into_rgb()
-    context.handle_sprite_size(analysis)
-    context.handle_sprite_colors(analysis)
-    context.handle_sprite_transparency(analysis)
-    context.handle_sprite_half_pixels(analysis)
+    if analysis.attachment_bytes is None:
+        raise RuntimeError()
+    result = analyze_sprite(analysis.attachment_bytes, analysis.fusion_filename.id_type)
+    apply_sprite_result(analysis, result)
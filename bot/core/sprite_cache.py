@@ -0,0 +1,74 @@
+import hashlib
+import os
+import pickle
+
+from bot.misc.cache import LRUCache
+from bot.misc.enums import IdType
+from bot.misc.utils import open_atomically
+from .sprite_analysis import SpriteResult
+
+# Pixel check results keyed on the image content, so the same PNG posted in spritework,
+# a ping reply and the galleries only gets decoded and analyzed once
+RESULT_CACHE_SIZE = 64 * 1024 * 1024    # In bytes, mostly taken by the overlay PNGs
+PERSIST_RESULT_CACHE = False
+RESULT_CACHE_SAVE_INTERVAL = 50         # New results between saves to disk
+RESULT_OVERHEAD = 1024                  # Rough size of a result without its overlays
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULT_CACHE_FILE = os.path.join(CURRENT_DIR, "..", "..", "data", "SpriteResultCache.pickle")
+
+result_cache_loaded = False
+unsaved_results = 0
+
+
+def get_result_size(result: SpriteResult) -> int:
+    overlay_size = len(result.transparency_png or b"") + len(result.half_pixels_png or b"")
+    return RESULT_OVERHEAD + overlay_size
+
+
+result_cache = LRUCache(RESULT_CACHE_SIZE, weigh=get_result_size)
+
+
+def get_result_key(image_bytes: bytes, id_type: IdType) -> tuple[str, str]:
+    # The id type decides the expected size, grid step and color limits
+    return hashlib.sha256(image_bytes).hexdigest(), id_type.name
+
+
+def get_cached_result(result_key: tuple[str, str]) -> SpriteResult|None:
+    load_result_cache()
+    return result_cache.get(result_key)
+
+
+def store_result(result_key: tuple[str, str], result: SpriteResult):
+    global unsaved_results
+    result_cache.put(result_key, result)
+    if not PERSIST_RESULT_CACHE:
+        return
+    unsaved_results += 1
+    if unsaved_results >= RESULT_CACHE_SAVE_INTERVAL:
+        save_result_cache()
+
+
+def get_result_cache_stats() -> dict[str, int]:
+    return result_cache.stats()
+
+
+def load_result_cache():
+    global result_cache_loaded
+    if result_cache_loaded or not PERSIST_RESULT_CACHE:
+        return
+    result_cache_loaded = True
+    try:
+        with open(RESULT_CACHE_FILE, 'rb') as f:
+            entries = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return  # Missing file, or results from an incompatible version: starts with a cold cache
+    for result_key, result in entries:
+        result_cache.put(result_key, result)
+
+
+def save_result_cache():
+    global unsaved_results
+    with open_atomically(RESULT_CACHE_FILE) as f:
+        pickle.dump(list(result_cache.items()), f)
+    unsaved_results = 0
@@ -0,0 +1,95 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from bot.misc import timings
+from bot.misc.enums import IdType
+from . import sprite_analysis, sprite_cache
+from .analysis import Analysis
+from .sprite_analysis import SpriteResult
+
+# The pixel checks are CPU bound, so they run in worker processes to keep the event loop free.
+# With 0 workers they run in the bot process itself, like before.
+SPRITE_WORKERS = 2
+
+# Backpressure: once this many sprites are queued or running, new ones wait for a free slot
+# instead of piling up in the executor
+MAX_PENDING_SPRITES = 8
+
+executor: ProcessPoolExecutor|None = None
+pending_slots: asyncio.Semaphore|None = None
+
+
+async def main(analysis: Analysis):
+    if analysis.attachment_bytes is None:
+        raise RuntimeError()
+    result = await run_sprite_analysis(analysis.attachment_bytes, analysis.fusion_filename.id_type)
+    sprite_analysis.apply_sprite_result(analysis, result)
+
+
+async def run_sprite_analysis(image_bytes: bytes, id_type: IdType) -> SpriteResult:
+    result_key = sprite_cache.get_result_key(image_bytes, id_type)
+    cached_result = sprite_cache.get_cached_result(result_key)
+    if cached_result is not None:
+        return cached_result
+    result = await analyze_in_executor(image_bytes, id_type)
+    timings.record_all(result.stage_times)
+    sprite_cache.store_result(result_key, result)
+    return result
+
+
+async def analyze_in_executor(image_bytes: bytes, id_type: IdType) -> SpriteResult:
+    if SPRITE_WORKERS == 0:
+        return sprite_analysis.analyze_sprite(image_bytes, id_type)
+    async with get_pending_slots():
+        try:
+            return await run_in_worker(image_bytes, id_type)
+        except BrokenProcessPool:
+            # A worker died (out of memory, crash while decoding), which breaks the whole pool.
+            # Retried once in a new pool, if it breaks again the sprite itself is likely the cause.
+            print("Sprite worker pool broke, starting a new one")
+            return await run_in_worker(image_bytes, id_type)
+
+
+async def run_in_worker(image_bytes: bytes, id_type: IdType) -> SpriteResult:
+    """# BrokenProcessPool"""
+    current_executor = get_executor()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(current_executor, sprite_analysis.analyze_sprite, image_bytes, id_type)
+    except BrokenProcessPool:
+        discard_executor(current_executor)
+        raise
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global executor
+    if executor is None:
+        # Spawned instead of forked, the bot process has an event loop and network threads running
+        executor = ProcessPoolExecutor(max_workers=SPRITE_WORKERS,
+                                       mp_context=multiprocessing.get_context("spawn"))
+    return executor
+
+
+def get_pending_slots() -> asyncio.Semaphore:
+    global pending_slots
+    if pending_slots is None:
+        pending_slots = asyncio.Semaphore(MAX_PENDING_SPRITES)
+    return pending_slots
+
+
+def discard_executor(broken_executor: ProcessPoolExecutor):
+    """The next analysis gets a new pool. Several analyses can fail on the same broken pool,
+    so it's only discarded if it wasn't replaced already."""
+    global executor
+    if executor is broken_executor:
+        broken_executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
+
+
+def shutdown():
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
@@ -1,17 +1,21 @@
 import asyncio
 
 import discord
-from discord import Message, Thread, HTTPException, PartialEmoji, DMChannel, TextChannel
+from discord import Message, Thread, HTTPException, PartialEmoji, DMChannel, TextChannel, Attachment
 
 from bot.context.message_identifier import is_assets_gallery
 from bot.context.message_identifier import is_message_from_ignored_bots, has_ignored_spritework_tags
 from bot.context.setup import ctx
 from bot.core.analysis import Analysis
+from bot.core.analysis_input import AnalysisInput
 from bot.core.analyzer import send_extra_embeds
 from bot.core.analyzer import send_full_analysis, generate_analysis, send_analysis, generate_gallery_analysis_list
+from bot.core.filename_analysis import get_filename_from_zigzag_image_url
 from bot.core.issues import DifferentSprite
 from bot.misc.enums import AnalysisType, Severity
-from bot.misc.utils import fancy_print, attachment_not_an_image
+from bot.misc.exceptions import AttachmentTooLarge
+from bot.misc.fetcher import read_attachment
+from bot.misc.utils import fancy_print, attachment_not_an_image, get_display_avatar
 from bot.spritework.opt_out_options import is_opted_out_user
 from bot.spritework.spritework_checker import get_spritework_thread_times
 from bot.spritework.tutorial_mode import send_tutorial_mode_prompt, user_is_potential_spriter
@@ -39,7 +43,10 @@ async def handle_gallery(message: Message, is_assets: bool = False):
         analysis_type = AnalysisType.assets_gallery
     else:
         analysis_type = AnalysisType.sprite_gallery
-    analysis_list = await generate_gallery_analysis_list(message, analysis_type)
+    analysis_inputs = await asyncio.gather(*(get_analysis_input(message, attachment, analysis_type)
+                                             for attachment in message.attachments
+                                             if not attachment_not_an_image(attachment)))
+    analysis_list = await generate_gallery_analysis_list(analysis_inputs)
     for analysis in analysis_list:
         if analysis.issues.has_issue(DifferentSprite):
             await handle_misnumbered_in_gallery(message, analysis)
@@ -63,7 +70,7 @@ async def handle_zigzag_galpost(message: Message):
     else:
         analysis_type = AnalysisType.zigzag_fusion
 
-    analysis = generate_analysis(message, specific_attachment=None, analysis_type=analysis_type)
+    analysis = await generate_analysis(await get_analysis_input(message, None, analysis_type))
     if analysis.severity == Severity.refused:       # Only for refused tier
         channel = ctx().pif.zigzagoon
     else:
@@ -81,7 +88,8 @@ async def handle_regular_analysis(message: Message, auto_spritework: bool = Fals
     for specific_attachment in message.attachments:
         if attachment_not_an_image(specific_attachment):
             continue
-        analysis = generate_analysis(message, specific_attachment, analysis_type)
+        analysis_input = await get_analysis_input(message, specific_attachment, analysis_type)
+        analysis = await generate_analysis(analysis_input)
         try:
             await notify_if_ai(analysis, message, analysis_type, channel)
             await send_full_analysis(analysis, channel, message.author)
@@ -181,6 +189,43 @@ async def handle_ping_without_attachments(message: Message):
                         f"you can **reply to that image and ping @Fusion Bot in your reply**.")
 
 
+async def get_analysis_input(message: Message,
+                             attachment: Attachment|None,
+                             analysis_type: AnalysisType) -> AnalysisInput:
+    """# aiohttp.ClientError, asyncio.TimeoutError
+    Message attachments are read here through discord.py.
+    Zigzag embeds only have the image URL, so those get downloaded later by the analyzer."""
+    attachment_bytes = None
+    attachment_too_large = False
+    if analysis_type.is_zigzag_galpost():
+        attachment_url = get_zigzag_image_url(message)
+        filename = get_filename_from_zigzag_image_url(attachment_url) if attachment_url else None
+    else:
+        if attachment is None and message.attachments:
+            attachment = message.attachments[0]
+        attachment_url = attachment.url if attachment else None
+        filename = attachment.filename if attachment else None
+        if attachment is not None:
+            try:
+                attachment_bytes = await read_attachment(attachment)
+            except AttachmentTooLarge:
+                attachment_too_large = True
+    return AnalysisInput(filename, attachment_url, message.content, message.author.id, message.author.name,
+                         message.jump_url, message.id, analysis_type,
+                         author_avatar_url=get_display_avatar(message.author).url,
+                         attachment_bytes=attachment_bytes,
+                         attachment_too_large=attachment_too_large)
+
+
+def get_zigzag_image_url(message: Message) -> str|None:
+    if not message.embeds:
+        return None
+    embed = message.embeds[0]
+    if embed.image is None:
+        return None
+    return embed.image.url
+
+
 def log_event(decorator: str, event: Message | Thread):
     if isinstance(event, Message):
         _log_message(decorator, event)
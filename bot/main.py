@@ -2,15 +2,19 @@
 import os
 
 import discord
-from discord import app_commands, Thread
+from discord import app_commands, Thread, RawMessageDeleteEvent, RawBulkMessageDeleteEvent, RawMessageUpdateEvent
 from discord.message import Message
 from discord.user import User
 
 import command_actions
 from bot.context.message_identifier import (is_zigzag_galpost, is_sprite_gallery, is_mentioning_reply,
                                             is_spriter_application, is_message_from_ignored_bots,
-                                            is_spritework_post, is_mentioning_bot, is_assets_gallery)
+                                            is_spritework_post, is_mentioning_bot, is_assets_gallery,
+                                            is_gallery_channel)
 from bot.context.setup import set_bot_up, ctx
+from bot.core import sprite_executor
+from bot.core.gallery_index import gallery_index
+from bot.spritework.opt_out_options import flush_opt_out_list
 from bot.handler import (handle_zigzag_galpost, handle_sprite_gallery, handle_assets_gallery,
                          handle_spriter_application, handle_reply, handle_spritework_post, handle_direct_ping)
 
@@ -36,16 +40,28 @@ async def similar_command(interaction: discord.Interaction, sprite: discord.Atta
     await command_actions.similar_action(interaction, sprite)
 
 
+@tree.command(name="timings", description="Get the timings of every analysis stage")
+@app_commands.guild_only()
+@app_commands.default_permissions(administrator=True)     # Turning it off clears the timings of the whole bot
+async def timings_command(interaction: discord.Interaction, enable: bool|None = None):
+    await command_actions.timings_action(interaction, enable)
+
+
 @bot.event
 async def on_ready():
     await tree.sync()
     await set_bot_up(bot)
     await ctx().doodledoo.logs.send(content="Bot online")
+    if not gallery_index.ready:
+        await gallery_index.catch_up([ctx().pif.gallery, ctx().pif.assets])
 
 
 @bot.event
 async def on_message(message: Message):
     try:
+        if is_gallery_channel(message.channel.id):
+            gallery_index.add_message(message)
+
         if is_message_from_ignored_bots(message):
             return
 
@@ -69,6 +85,25 @@ async def on_message(message: Message):
         raise RuntimeError from message_exception
 
 
+@bot.event
+async def on_raw_message_edit(payload: RawMessageUpdateEvent):
+    if is_gallery_channel(payload.channel_id):
+        gallery_index.add_message(payload.message)
+
+
+@bot.event
+async def on_raw_message_delete(payload: RawMessageDeleteEvent):
+    if is_gallery_channel(payload.channel_id):
+        gallery_index.remove_message(payload.message_id)
+
+
+@bot.event
+async def on_raw_bulk_message_delete(payload: RawBulkMessageDeleteEvent):
+    if is_gallery_channel(payload.channel_id):
+        for message_id in payload.message_ids:
+            gallery_index.remove_message(message_id)
+
+
 @bot.event
 async def on_thread_create(thread: Thread):
     try:
@@ -97,4 +132,7 @@ def get_discord_token():
 if __name__ == "__main__":
     discord_token = get_discord_token()
     bot.run(discord_token)
+    sprite_executor.shutdown()
+    gallery_index.close()
+    flush_opt_out_list()
 
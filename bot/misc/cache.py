@@ -0,0 +1,147 @@
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from .utils import open_atomically
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entries first, and counts hits and misses.
+    By default every entry counts as 1 towards max_size, a weigh function can give them other sizes."""
+    max_size: int
+    total_size: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_size: int, weigh: Callable[[Any], int]|None = None):
+        self.max_size = max_size
+        self.weigh = weigh
+        self.entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.total_size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self.entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key: Hashable, value: Any):
+        if key in self.entries:
+            self.total_size -= self.get_entry_size(self.entries[key])
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        self.total_size += self.get_entry_size(value)
+        while self.total_size > self.max_size and self.entries:
+            _evicted_key, evicted_value = self.entries.popitem(last=False)
+            self.total_size -= self.get_entry_size(evicted_value)
+
+    def get_entry_size(self, value: Any) -> int:
+        if self.weigh is None:
+            return 1
+        return self.weigh(value)
+
+    def items(self):
+        """From least to most recently used"""
+        return self.entries.items()
+
+    def clear(self):
+        self.entries.clear()
+        self.total_size = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "size": self.total_size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class DiskCache:
+    """Bounded directory of byte blobs that evicts the least recently used files first.
+    Recency is kept in the file modification times, so it survives restarts."""
+    directory: str
+    max_size: int
+    total_size: int
+    hits: int
+    misses: int
+
+    def __init__(self, directory: str, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+        self.file_sizes: OrderedDict[str, int]|None = None
+        self.total_size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def load_file_sizes(self) -> OrderedDict[str, int]:
+        if self.file_sizes is not None:
+            return self.file_sizes
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        self.file_sizes = OrderedDict((name, size) for _mtime, name, size in sorted(entries))
+        self.total_size = sum(self.file_sizes.values())
+        return self.file_sizes
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> bytes|None:
+        file_sizes = self.load_file_sizes()
+        if key not in file_sizes:
+            self.misses += 1
+            return None
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            self.total_size -= file_sizes.pop(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        file_sizes.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes):
+        file_sizes = self.load_file_sizes()
+        path = self.get_path(key)
+        with open_atomically(path) as f:
+            f.write(data)
+        if key in file_sizes:
+            self.total_size -= file_sizes[key]
+        file_sizes[key] = len(data)
+        file_sizes.move_to_end(key)
+        self.total_size += len(data)
+        while self.total_size > self.max_size and file_sizes:
+            evicted_key, evicted_size = file_sizes.popitem(last=False)
+            self.total_size -= evicted_size
+            try:
+                os.remove(self.get_path(evicted_key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self.file_sizes or ()),
+            "size": self.total_size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -0,0 +1,57 @@
+import json
+import os
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+NAMES_JSON_FILE = os.path.join(CURRENT_DIR, "..", "..", "data", "PokemonNames.json")
+
+
+class DexEntry:
+    __slots__ = ("id", "display_name", "name", "typos")
+    id: int
+    display_name: str
+    name: str           # Lowercase, without spaces or symbols
+    typos: tuple[str, ...]
+
+    def __init__(self, pokemon_id: int, display_name: str, name: str, typos: tuple[str, ...]):
+        self.id = pokemon_id
+        self.display_name = display_name
+        self.name = name
+        self.typos = typos
+
+
+class DexRegistry:
+    """Every Pokémon in PokemonNames.json, keyed by their dex id as it appears in filenames and messages"""
+    entries: dict[str, DexEntry]
+
+    def __init__(self, pokemon_list: list[dict]):
+        self.entries = {}
+        for element in pokemon_list:  # Thanks Greystorm for the file
+            entry = DexEntry(int(element["id"]), element["display_name"], element["name"], tuple(element["typos"]))
+            self.entries[element["id"]] = entry
+
+    def __contains__(self, pokemon_id: str) -> bool:
+        return pokemon_id in self.entries
+
+    def get(self, pokemon_id: str) -> DexEntry|None:
+        return self.entries.get(pokemon_id)
+
+    def get_display_name(self, pokemon_id: str) -> str|None:
+        entry = self.entries.get(pokemon_id)
+        if entry is None:
+            return None
+        return entry.display_name
+
+    def id_to_all_names_map(self) -> dict[str, list[str]]:
+        """Display name followed by the typos of every Pokémon"""
+        return {pokemon_id: [entry.display_name, *entry.typos] for pokemon_id, entry in self.entries.items()}
+
+
+dex_registry: DexRegistry|None = None
+
+
+def get_dex() -> DexRegistry:
+    global dex_registry
+    if dex_registry is None:
+        with open(NAMES_JSON_FILE) as f:
+            dex_registry = DexRegistry(json.load(f)["pokemon"])
+    return dex_registry
@@ -23,6 +23,7 @@ class Description(str, Enum):
     wrong_letter        = "Wrong filename alt letter"
     missing_letters     = "Missing alt letters in message"
     not_png             = "Invalid image format"
+    file_too_large      = "File too large to analyze"
     invalid_size        = "Invalid size"
     custom              = "custom base"
     egg                 = "egg sprite"
@@ -2,4 +2,7 @@ class TransparencyException(Exception):
     pass
 
 class MissingBotContext(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class AttachmentTooLarge(Exception):
+    pass
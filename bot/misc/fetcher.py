@@ -0,0 +1,99 @@
+import asyncio
+from urllib.parse import urlsplit
+
+import aiohttp
+from discord import Attachment, HTTPException
+
+from bot.context.setup import get_bot_client
+from bot.misc.exceptions import AttachmentTooLarge
+
+FETCH_TIMEOUT = 10
+FETCH_RETRIES = 3
+RETRY_DELAY = 0.5               # Doubled after every failed attempt
+PER_HOST_LIMIT = 4              # Concurrent downloads from the same host
+MAX_ATTACHMENT_SIZE = 16 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+session: aiohttp.ClientSession|None = None
+host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+
+async def read_attachment(attachment: Attachment) -> bytes:
+    """# AttachmentTooLarge, aiohttp.ClientError, asyncio.TimeoutError
+    Reads a message attachment through discord.py, using the URL download only if that fails"""
+    if attachment.size > MAX_ATTACHMENT_SIZE:
+        raise AttachmentTooLarge(attachment.url)
+    try:
+        return await attachment.read()
+    except HTTPException:
+        return await fetch_attachment(attachment.url)
+
+
+async def fetch_attachment(url: str) -> bytes:
+    """# AttachmentTooLarge, aiohttp.ClientError, asyncio.TimeoutError
+    Downloads an image without blocking the event loop, retrying on network and server errors"""
+    host = urlsplit(url).hostname or ""
+    async with get_host_semaphore(host):
+        for attempt in range(FETCH_RETRIES):
+            try:
+                return await download_with_size_cap(url)
+            except aiohttp.ClientResponseError as response_error:
+                if response_error.status < 500 or is_last_attempt(attempt):
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if is_last_attempt(attempt):
+                    raise
+            await asyncio.sleep(RETRY_DELAY * (2 ** attempt))
+    raise RuntimeError("Unreachable")
+
+
+async def download_with_size_cap(url: str) -> bytes:
+    """# AttachmentTooLarge"""
+    async with get_session().get(url) as response:
+        response.raise_for_status()
+        if response.content_length and response.content_length > MAX_ATTACHMENT_SIZE:
+            raise AttachmentTooLarge(url)
+        buffer = bytearray()
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            buffer.extend(chunk)
+            if len(buffer) > MAX_ATTACHMENT_SIZE:
+                raise AttachmentTooLarge(url)
+        return bytes(buffer)
+
+
+def get_session() -> aiohttp.ClientSession:
+    # Reuses the connection pool of discord.py once the bot has logged in
+    global session
+    if session is None or session.closed:
+        connector = get_discord_connector()
+        if connector is None:
+            connector = aiohttp.TCPConnector(limit_per_host=PER_HOST_LIMIT)
+            connector_owner = True
+        else:
+            connector_owner = False
+        session = aiohttp.ClientSession(
+            connector=connector,
+            connector_owner=connector_owner,
+            timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT)
+        )
+    return session
+
+
+def get_discord_connector() -> aiohttp.BaseConnector|None:
+    client = get_bot_client()
+    if client is None:
+        return None
+    connector = client.http.connector
+    if not isinstance(connector, aiohttp.BaseConnector) or connector.closed:
+        return None
+    return connector
+
+
+def get_host_semaphore(host: str) -> asyncio.Semaphore:
+    if host not in host_semaphores:
+        host_semaphores[host] = asyncio.Semaphore(PER_HOST_LIMIT)
+    return host_semaphores[host]
+
+
+def is_last_attempt(attempt: int) -> bool:
+    return attempt == FETCH_RETRIES - 1
@@ -0,0 +1,57 @@
+from collections import deque
+
+
+class PokemonNameMatcher:
+    """Aho-Corasick automaton over every Pokémon name and typo.
+    A single scan of a text finds every Pokémon mentioned in it, overlapping mentions included."""
+    transitions: list[dict[str, int]]
+    failure_links: list[int]
+    outputs: list[set[str]]
+
+    def __init__(self, id_to_names: dict[str, list[str]]):
+        self.transitions = [{}]
+        self.failure_links = [0]
+        self.outputs = [set()]
+        for pokemon_id, names in id_to_names.items():
+            for name in names:
+                self.add_name(name.lower(), pokemon_id)
+        self.build_failure_links()
+
+    def add_name(self, name: str, pokemon_id: str):
+        state = 0
+        for character in name:
+            next_state = self.transitions[state].get(character)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions.append({})
+                self.failure_links.append(0)
+                self.outputs.append(set())
+                self.transitions[state][character] = next_state
+            state = next_state
+        self.outputs[state].add(pokemon_id)
+
+    def build_failure_links(self):
+        # Breadth first, so the failure link of a state is always ready before its children need it
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                fallback = self.failure_links[state]
+                while fallback and character not in self.transitions[fallback]:
+                    fallback = self.failure_links[fallback]
+                link = self.transitions[fallback].get(character, 0)
+                self.failure_links[next_state] = link if link != next_state else 0
+                self.outputs[next_state] |= self.outputs[self.failure_links[next_state]]
+
+    def find_ids(self, text: str) -> set[str]:
+        """Ids of every Pokémon whose name or typo appears in the text, case insensitive"""
+        found_ids = set(self.outputs[0])
+        state = 0
+        for character in text.lower():
+            while state and character not in self.transitions[state]:
+                state = self.failure_links[state]
+            state = self.transitions[state].get(character, 0)
+            if self.outputs[state]:
+                found_ids |= self.outputs[state]
+        return found_ids
@@ -0,0 +1,86 @@
+import time
+from collections import deque
+
+# Per stage durations of the analysis pipeline, shown with /timings.
+# While disabled, spans only check this flag, so they can stay in the hot paths.
+TIMINGS_ENABLED = False
+TIMING_WINDOW = 512         # Latest durations kept per stage for the percentiles
+PERCENTILES = [50, 90, 99]
+
+enabled = TIMINGS_ENABLED
+stage_durations: dict[str, deque[float]] = {}
+
+
+class Span:
+    """with Span("stage"): records how long the block took, in seconds.
+    Worker processes pass their own stage_times, which get sent back with the result and recorded by the bot."""
+    __slots__ = ("stage", "stage_times", "start_time")
+
+    def __init__(self, stage: str, stage_times: dict[str, float]|None = None):
+        self.stage = stage
+        self.stage_times = stage_times
+        self.start_time = 0.0
+
+    def __enter__(self) -> "Span":
+        if enabled or self.stage_times is not None:
+            self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *_exception_info) -> bool:
+        if self.start_time == 0.0:
+            return False
+        duration = time.perf_counter() - self.start_time
+        if self.stage_times is not None:
+            self.stage_times[self.stage] = self.stage_times.get(self.stage, 0.0) + duration
+        else:
+            record(self.stage, duration)
+        return False
+
+
+def record(stage: str, duration: float):
+    if not enabled:
+        return
+    durations = stage_durations.get(stage)
+    if durations is None:
+        durations = stage_durations[stage] = deque(maxlen=TIMING_WINDOW)
+    durations.append(duration)
+
+
+def record_all(stage_times: dict[str, float]):
+    for stage, duration in stage_times.items():
+        record(stage, duration)
+
+
+def set_enabled(new_value: bool):
+    global enabled
+    enabled = new_value
+    if not enabled:
+        stage_durations.clear()
+
+
+def get_percentile(sorted_durations: list[float], percentile: int) -> float:
+    # Nearest rank
+    rank = max(1, -(-len(sorted_durations) * percentile // 100))
+    return sorted_durations[rank - 1]
+
+
+def get_stage_stats() -> dict[str, dict[str, float]]:
+    """Count, percentiles and maximum of every stage, in milliseconds"""
+    stage_stats = {}
+    for stage, durations in sorted(stage_durations.items()):
+        sorted_durations = sorted(durations)
+        stats = {"count": len(sorted_durations)}
+        for percentile in PERCENTILES:
+            stats[f"p{percentile}"] = get_percentile(sorted_durations, percentile) * 1000
+        stats["max"] = sorted_durations[-1] * 1000
+        stage_stats[stage] = stats
+    return stage_stats
+
+
+def format_stage_stats() -> str:
+    header = f"{'stage':<28}{'n':>6}" + "".join(f"{f'p{p}':>10}" for p in PERCENTILES) + f"{'max':>10}"
+    lines = [header]
+    for stage, stats in get_stage_stats().items():
+        values = "".join(f"{stats[f'p{p}']:>10.3f}" for p in PERCENTILES)
+        lines.append(f"{stage:<28}{stats['count']:>6}{values}{stats['max']:>10.3f}")
+    return "\n".join(lines)
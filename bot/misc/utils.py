@@ -1,6 +1,8 @@
 import json
 import os
 import re
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
 
 from discord import Attachment
 from discord.asset import Asset
@@ -8,9 +10,9 @@ from discord.member import Member
 from discord.message import Message
 from discord.user import User, ClientUser
 
+from .dex import get_dex
 from .enums import IdType
 
-MAX_DEX_ID = 572
 AUTOGEN_MAX_ID = 501
 NECROZMA_DEX_ID = 450
 
@@ -23,8 +25,6 @@ NUMBER_PATTERN_FUSION_ID = rf'({DEX_ID})\.({DEX_ID})'
 NUMBER_PATTERN_CUSTOM_ID = rf'({DEX_ID})'
 # 123.456.789
 NUMBER_PATTERN_TRIPLE_ID = rf'({DEX_ID})\.({DEX_ID})\.({DEX_ID})'
-# 123_egg
-NUMBER_PATTERN_EGG_ID = rf'({DEX_ID}_egg)'
 
 # (123.456a)
 TEXT_PATTERN_FUSION_ID = rf'\(({DEX_ID})\.({DEX_ID}){LETTER}\)'
@@ -32,37 +32,30 @@ TEXT_PATTERN_FUSION_ID = rf'\(({DEX_ID})\.({DEX_ID}){LETTER}\)'
 TEXT_PATTERN_CUSTOM_ID = rf'\(({DEX_ID}){LETTER}\)'
 # (123.456.789a)
 TEXT_PATTERN_TRIPLE_ID = rf'\(({DEX_ID})\.({DEX_ID})\.({DEX_ID}){LETTER}\)'
-
-
-CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-NAMES_JSON_FILE = os.path.join(CURRENT_DIR, "..", "..", "data", "PokemonNames.json")
+# Any of the above: (123a), (123.456a) or (123.456.789a)
+TEXT_PATTERN_ANY_ID = rf'\(({DEX_ID}(?:\.{DEX_ID}){{0,2}})({LETTER})\)'
 
 
 def is_missing_autogen(fusion_id: str):
-    split_fusion_id = fusion_id.split(".")
-    head_id = int(split_fusion_id[0])
-    body_id = int(split_fusion_id[1])
+    head_id, body_id = fusion_id.split(".")[:2]
+    head = get_dex().get(head_id)
+    body = get_dex().get(body_id)
+    if head is None or body is None:
+        return True
     # Special case: Necrozma bodies are just Ultra Necrozma again
-    if body_id == NECROZMA_DEX_ID:
+    if body.id == NECROZMA_DEX_ID:
         return True
-    return head_id > AUTOGEN_MAX_ID or body_id > AUTOGEN_MAX_ID
+    return head.id > AUTOGEN_MAX_ID or body.id > AUTOGEN_MAX_ID
 
 
 def is_invalid_fusion_id(fusion_id: str):
-    if "." in fusion_id:
-        fusion_id_list = fusion_id.split(".")
-    else:
-        fusion_id_list = [fusion_id]
-    for fusion_id in fusion_id_list:
-        id_int = int(fusion_id)
-        if id_int > MAX_DEX_ID:
-            return True
-    return False
+    # Dex ids never have leading zeros, so any id in range is a key of the registry
+    dex = get_dex()
+    return any(pokemon_id not in dex for pokemon_id in fusion_id.split("."))
 
 
 def is_invalid_base_id(base_id: str):
-    pokemon_id = int(base_id)
-    return pokemon_id > MAX_DEX_ID
+    return base_id not in get_dex()
 
 
 def get_display_avatar(user: User | Member | ClientUser) -> Asset:
@@ -74,8 +67,7 @@ def is_chat_gpt_in_filename(filename: str) -> bool:
     return result is not None
 
 
-def extract_fusion_ids_from_content(message: Message, id_type: IdType):
-    content = message.content
+def extract_fusion_ids_from_content(content: str, id_type: IdType):
     id_list = []
     if id_type.is_custom_base() or id_type.is_egg():
         # Eggs use the same id type as custom bases in the gallery message
@@ -107,25 +99,39 @@ def get_clean_dex_ids(text: str, id_type: IdType) -> str | None:
     return None
 
 
+def extract_all_ids_from_content(content: str) -> dict[str, str]:
+    """Fusion ID -> alt letter of every ID in the content, keeping the first letter of repeated IDs"""
+    id_to_letter = {}
+    for fusion_id, letter in re.findall(TEXT_PATTERN_ANY_ID, content):
+        id_to_letter.setdefault(fusion_id, letter)
+    return id_to_letter
+
+
 def find_specific_fusion_id(message: Message, id_to_find: str) -> bool:
     result = re.search(rf'\({id_to_find}{LETTER}\)', message.content)
     return result is not None
 
 
-def id_to_name_map() -> dict[str, str]:  # Thanks Greystorm for the util and file
-    """Returns dictionary mapping id numbers to display names"""
-    return {element["id"]: element["display_name"] for element in pokemon_names()}
-
-
-def id_to_typos_map() -> dict[str, list[str]]:
-    """Returns dictionary mapping id numbers to an object with names and typos"""
-    return {element["id"]: element["typos"] for element in pokemon_names()}
-
-
-def pokemon_names() -> list[dict[str, str]]:
-    with open(NAMES_JSON_FILE) as f:
-        data = json.loads(f.read())
-        return data["pokemon"]
+@contextmanager
+def open_atomically(file_path: str) -> Iterator[BinaryIO]:
+    """with open_atomically(path) as f: the binary file only replaces path once the block succeeds.
+    It's written to a temporary file first, so a crash mid-write never leaves a truncated file behind"""
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            yield f
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def write_json_atomically(file_path: str, data):
+    with open_atomically(file_path) as f:
+        f.write(json.dumps(data).encode('utf-8'))
 
 
 BLUE_TEXT    = '\033[94m'
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 
@@ -5,10 +6,16 @@ import discord
 from discord import Member, ButtonStyle, Interaction, User, Message, HTTPException, Forbidden, NotFound
 from discord.ui import View, Button
 
-from bot.misc.utils import fancy_print
+from bot.misc.utils import fancy_print, write_json_atomically
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 OPT_OUT_FILE = os.path.join(CURRENT_DIR, "..", "..", "data", "OptedOutUsers.json")
+OPT_OUT_SAVE_DELAY = 5     # In seconds, opt outs that happen in the meantime are saved together
+
+opted_out_ids: set[int]|None = None
+loaded_file_version: int|None = None    # Modification time of the file when it was last read or written
+unsaved_ids: set[int] = set()
+save_task: asyncio.Task|None = None
 
 
 class HideAutoAnalysis(View):
@@ -88,20 +95,58 @@ async def different_user_response(interaction: Interaction, og_user: Member):
 
 
 async def is_opted_out_user(user: Member|User) -> bool:
-    user_list = await grab_user_list()
-    return user.id in user_list
+    return user.id in get_opted_out_ids()
 
 
 async def add_to_opt_out_list(user: Member|User):
-    user_list = await grab_user_list()
-    user_list.append(user.id)
-    with open(OPT_OUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(user_list, f)
-
-
-async def grab_user_list() -> list:
-    with open(OPT_OUT_FILE, 'r', encoding='utf-8') as f:
-        user_list = json.load(f)
-        if not isinstance(user_list, list):
-            return []
-        return user_list
+    global save_task
+    get_opted_out_ids().add(user.id)
+    unsaved_ids.add(user.id)
+    if save_task is None or save_task.done():
+        save_task = asyncio.create_task(save_opt_out_list())
+
+
+def get_opted_out_ids() -> set[int]:
+    """Kept in memory, and read again only when the file has been changed by something else"""
+    global opted_out_ids, loaded_file_version
+    file_version = get_file_version()
+    if opted_out_ids is None or file_version != loaded_file_version:
+        opted_out_ids = grab_user_set() | unsaved_ids
+        loaded_file_version = file_version
+    return opted_out_ids
+
+
+async def save_opt_out_list():
+    global loaded_file_version
+    while unsaved_ids:
+        await asyncio.sleep(OPT_OUT_SAVE_DELAY)
+        saved_ids = set(unsaved_ids)
+        user_list = sorted(get_opted_out_ids())
+        await asyncio.to_thread(write_json_atomically, OPT_OUT_FILE, user_list)
+        loaded_file_version = get_file_version()
+        unsaved_ids.difference_update(saved_ids)
+
+
+def flush_opt_out_list():
+    """Saves the pending opt outs right away, for when the event loop is gone"""
+    if unsaved_ids:
+        write_json_atomically(OPT_OUT_FILE, sorted(get_opted_out_ids()))
+        unsaved_ids.clear()
+
+
+def get_file_version() -> int|None:
+    try:
+        return os.stat(OPT_OUT_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def grab_user_set() -> set[int]:
+    try:
+        with open(OPT_OUT_FILE, 'r', encoding='utf-8') as f:
+            user_list = json.load(f)
+    except FileNotFoundError:
+        return set()
+    if not isinstance(user_list, list):
+        return set()
+    return set(user_list)
@@ -0,0 +1 @@
+# Lets the tests import the bot package when pytest is run from the repository root
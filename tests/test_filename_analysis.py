@@ -0,0 +1,113 @@
+import random
+import re
+
+import pytest
+
+from bot.core.filename_analysis import get_fusion_filename, remove_spoiler
+from bot.misc.enums import IdType
+
+DEX_ID = r'[1-9]\d{0,2}'
+LETTER = r'[a-z]{0,1}'
+
+FILENAME_AMOUNT = 20000
+VALID_SHARE = 0.85      # Chance of every piece of a generated filename being valid
+# Pieces that filenames are built from, as (valid choices, invalid choices)
+PREFIXES = (["", "SPOILER_"], ["spoiler_", "SPOILER_SPOILER_", " "])
+DEX_IDS = (["1", "9", "12", "123", "572", "999"], ["0", "05", "1234", ""])
+SEPARATORS = (["."], ["_", ". ", ""])
+EGG_SUFFIXES = (["", "_egg"], ["_EGG", "egg"])
+LETTERS = (["", "a", "b", "z"], ["A", "ab", "é"])
+EXTENSIONS = ([".png"], [".PNG", ".jpg", ".png.png", " (1).png", ".png\u200b"])
+DEX_ID_AMOUNTS = [1, 2, 3, 4]
+
+
+# The eight patterns that FILENAME_PATTERN replaced, kept as the reference
+
+OLD_LETTER_AND_PNG_PATTERN = rf'{LETTER}\.png$'
+OLD_NUMBER_PATTERN_FUSION_ID = rf'({DEX_ID})\.({DEX_ID})'
+OLD_NUMBER_PATTERN_CUSTOM_ID = rf'({DEX_ID})'
+OLD_NUMBER_PATTERN_TRIPLE_ID = rf'({DEX_ID})\.({DEX_ID})\.({DEX_ID})'
+OLD_NUMBER_PATTERN_EGG_ID = rf'({DEX_ID}_egg)'
+
+OLD_PATTERNS = [
+    (OLD_NUMBER_PATTERN_FUSION_ID, IdType.fusion),
+    (OLD_NUMBER_PATTERN_CUSTOM_ID, IdType.custom_base),
+    (OLD_NUMBER_PATTERN_TRIPLE_ID, IdType.triple),
+    (OLD_NUMBER_PATTERN_EGG_ID, IdType.egg)
+]
+
+
+def old_get_fusion_filename(filename: str) -> tuple[IdType, str|None, str|None, str|None]:
+    """id type, dex ids, letter and id_and_letter, like the old FusionFilename"""
+    for number_pattern, id_type in OLD_PATTERNS:
+        filename_pattern = number_pattern + OLD_LETTER_AND_PNG_PATTERN
+        if re.match(rf'^{filename_pattern}', filename) or re.match(rf'^SPOILER_{filename_pattern}', filename):
+            full_filename = filename.replace("SPOILER_", "")
+            dex_ids = old_get_clean_dex_ids(full_filename, id_type)
+            letter = full_filename.replace("_egg", "").replace(".png", "").replace(dex_ids, "")
+            return id_type, dex_ids, letter, full_filename.replace(".png", "")
+    return IdType.unknown, None, None, None
+
+
+def old_get_clean_dex_ids(text: str, id_type: IdType) -> str|None:
+    if id_type.is_custom_base() or id_type.is_egg():
+        search_pattern = OLD_NUMBER_PATTERN_CUSTOM_ID
+    elif id_type == IdType.triple:
+        search_pattern = OLD_NUMBER_PATTERN_TRIPLE_ID
+    else:
+        search_pattern = OLD_NUMBER_PATTERN_FUSION_ID
+    result = re.search(search_pattern, text)
+    if result:
+        return result.group()
+    return None
+
+
+def generate_filenames() -> list[str]:
+    rng = random.Random(FILENAME_AMOUNT)
+    filenames = []
+    for _ in range(FILENAME_AMOUNT):
+        dex_ids = [pick(rng, DEX_IDS) for _ in range(rng.choice(DEX_ID_AMOUNTS))]
+        filename = (pick(rng, PREFIXES) + pick(rng, SEPARATORS).join(dex_ids)
+                    + pick(rng, EGG_SUFFIXES) + pick(rng, LETTERS) + pick(rng, EXTENSIONS))
+        filenames.append(filename)
+    return filenames
+
+
+def pick(rng: random.Random, choices: tuple[list[str], list[str]]) -> str:
+    valid_choices, invalid_choices = choices
+    if rng.random() < VALID_SHARE:
+        return rng.choice(valid_choices)
+    return rng.choice(invalid_choices)
+
+
+def assert_same_as_old(filename: str):
+    fusion_filename = get_fusion_filename(filename)
+    id_type, dex_ids, letter, id_and_letter = old_get_fusion_filename(filename)
+    assert fusion_filename.id_type == id_type, filename
+    assert fusion_filename.dex_ids == dex_ids, filename
+    assert fusion_filename.letter == letter, filename
+    assert fusion_filename.id_and_letter() == id_and_letter, filename
+
+
+@pytest.mark.parametrize("filename", [
+    "1.2.png", "123.456b.png", "25.png", "25c.png", "1.2.3.png", "1.2.3a.png", "1_egg.png", "1_eggb.png",
+    "SPOILER_1.2.png", "SPOILER_25a.png", "SPOILER_1.2.3.png", "SPOILER_7_egg.png", "SPOILER_SPOILER_1.2.png",
+    "0.2.png", "1.2ab.png", "1.2.PNG", "1.2.png.png", "1234.png", "sprite.png", "1.2 (1).png", "", ".png"
+])
+def test_known_filenames_match_old_patterns(filename):
+    assert_same_as_old(filename)
+
+
+def test_generated_filenames_match_old_patterns():
+    for filename in generate_filenames():
+        assert_same_as_old(filename)
+        assert_same_as_old("SPOILER_" + filename)
+
+
+def test_spoiler_prefix_is_removed():
+    fusion_filename = get_fusion_filename("SPOILER_12.34c.png")
+    assert fusion_filename.id_type == IdType.fusion
+    assert fusion_filename.dex_ids == "12.34"
+    assert fusion_filename.letter == "c"
+    assert fusion_filename.full_filename == remove_spoiler("SPOILER_12.34c.png") == "12.34c.png"
+    assert fusion_filename.id_and_letter() == "12.34c"
@@ -0,0 +1,125 @@
+from io import BytesIO
+
+import numpy
+import pytest
+from PIL.Image import Image, new, fromarray
+
+from bot.core import sprite_analysis
+from bot.misc.enums import IdType
+
+RED = (255, 0, 0, 255)
+GREEN = (0, 255, 0, 255)
+
+SIZES = [(288, 3, IdType.fusion), (160, 2, IdType.egg)]
+MODES = ["RGBA", "P", "RGB", "L", "LA"]
+DENSITIES = [0, 0.01]
+SHIFTS = [(0, 0), (1, 2)]
+
+
+# The pixel by pixel loop that highlight_half_pixels replaced, kept as the reference
+
+def old_highlight_half_pixels(image: Image, max_size: int, step: int, strict_grid: bool) -> tuple[int, Image]:
+    pixels = image.load()
+    local_image = new("RGBA", (max_size, max_size))
+    local_pixels = local_image.load()
+    if strict_grid:
+        (delta_i, delta_j) = (0, 0)
+    else:
+        (delta_i, delta_j) = old_find_first_pixel(pixels, max_size)
+    max_i = max_size - (step - delta_i)
+    max_j = max_size - (step - delta_j)
+    half_pixels_amount = 0
+    for i in range(delta_i, max_i, step):
+        for j in range(delta_j, max_j, step):
+            color_set = old_get_color_set(i, j, pixels, step)
+            color = RED if len(color_set) > 1 else GREEN
+            for increment_i in range(0, step):
+                for increment_j in range(0, step):
+                    local_pixels[i + increment_i, j + increment_j] = color
+            if color == RED:
+                half_pixels_amount += (step * step)
+    return half_pixels_amount, local_image
+
+
+def old_find_first_pixel(pixels, max_size: int):
+    default_value = pixels[0, 0]
+    for i in range(0, max_size):
+        for j in range(0, max_size):
+            if default_value != pixels[i, j]:
+                return i % 3, j % 3
+    return 0, 0
+
+
+def old_get_color_set(i: int, j: int, pixels, step: int):
+    color_set = set()
+    for increment_i in range(0, step):
+        for increment_j in range(0, step):
+            pixel = pixels[i + increment_i, j + increment_j]
+            # Equalize all colored fully transparent pixels
+            if isinstance(pixel, tuple) and len(pixel) == 4 and pixel[3] == 0:
+                pixel = (0, 0, 0, 0)
+            color_set.add(pixel)
+    return color_set
+
+
+def generate_sprite(size: int, step: int, mode: str, density: float, shift: tuple[int, int]) -> bytes:
+    rng = numpy.random.default_rng(size + int(density * 1000) + shift[0] + MODES.index(mode) * 10)
+    palette = rng.integers(0, 256, size=(16, 4), dtype=numpy.uint8)
+    palette[:, 3] = rng.choice([0, 128, 255, 255], size=len(palette))
+    cells = size // step + 1
+    cell_colors = rng.integers(0, len(palette), size=(cells, cells))
+    pixel_array = palette[cell_colors].repeat(step, 0).repeat(step, 1)
+    pixel_array = numpy.roll(pixel_array, shift, axis=(0, 1))[:size, :size].copy()
+    half_pixel_amount = int(size * size * density)
+    half_pixels_i = rng.integers(0, size, half_pixel_amount)
+    half_pixels_j = rng.integers(0, size, half_pixel_amount)
+    pixel_array[half_pixels_i, half_pixels_j] = palette[rng.integers(0, len(palette), half_pixel_amount)]
+    # Fully transparent pixels with leftover colors, which count as the same transparency
+    transparent = pixel_array[:, :, 3] == 0
+    pixel_array[transparent, :3] = rng.integers(0, 256, size=(int(transparent.sum()), 3), dtype=numpy.uint8)
+    image = fromarray(pixel_array, "RGBA")
+    if mode == "P":
+        image = image.quantize(colors=16)
+    elif mode != "RGBA":
+        image = image.convert(mode)
+    return get_png_bytes(image)
+
+
+def get_png_bytes(image: Image) -> bytes:
+    bytes_buffer = BytesIO()
+    image.save(bytes_buffer, format="PNG")
+    return bytes_buffer.getvalue()
+
+
+def get_sprite_context(image_bytes: bytes, id_type: IdType) -> sprite_analysis.SpriteContext:
+    context = sprite_analysis.SpriteContext(image_bytes, id_type)
+    context.turn_image_into_rgb()
+    return context
+
+
+def assert_same_half_pixels(image_bytes: bytes, size: int, step: int, id_type: IdType, strict_grid: bool):
+    context = get_sprite_context(image_bytes, id_type)
+    amount, overlay = context.highlight_half_pixels(strict_grid)
+    with sprite_analysis.image_open(BytesIO(image_bytes)) as image:
+        old_amount, old_overlay = old_highlight_half_pixels(image, size, step, strict_grid)
+    assert amount == old_amount
+    assert context.count_half_pixels(strict_grid) == old_amount
+    assert overlay.convert("RGBA").tobytes() == old_overlay.tobytes()
+
+
+@pytest.mark.parametrize("strict_grid", [True, False])
+@pytest.mark.parametrize("shift", SHIFTS)
+@pytest.mark.parametrize("density", DENSITIES)
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("size, step, id_type", SIZES)
+def test_half_pixels_match_old_loop(size, step, id_type, mode, density, shift, strict_grid):
+    image_bytes = generate_sprite(size, step, mode, density, shift)
+    assert_same_half_pixels(image_bytes, size, step, id_type, strict_grid)
+
+
+@pytest.mark.parametrize("strict_grid", [True, False])
+@pytest.mark.parametrize("color", [(0, 0, 0, 0), (10, 20, 30, 255)])
+@pytest.mark.parametrize("size, step, id_type", SIZES)
+def test_half_pixels_of_uniform_sprites(size, step, id_type, color, strict_grid):
+    image_bytes = get_png_bytes(new("RGBA", (size, size), color))
+    assert_same_half_pixels(image_bytes, size, step, id_type, strict_grid)